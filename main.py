@@ -1,4 +1,4 @@
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
 from pathlib import Path
 import os
 
@@ -6,6 +6,29 @@ import src.fjssp_heurs as app
 from src.fjssp_heurs.utils.logger import LOGGER
 
 
+def _positive_float(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise ArgumentTypeError(f"must be a positive number: {value}")
+    return number
+
+
+def _single_chain_options(args: Namespace) -> list[str]:
+    # given options that only the single-chain SA supports
+    options = []
+    if args.salogwriting == "Y":
+        options.append("-salog Y")
+    if args.saevents == "Y":
+        options.append("-saev Y")
+    if args.sbplogwriting == "Y":
+        options.append("-sbplog Y")
+    if args.saprogress != "all":
+        options.append(f"-saprog {args.saprogress}")
+    if args.sbpworkers > 1:
+        options.append(f"-sbpw {args.sbpworkers}")
+    return options
+
+
 def parse_arguments():
     parser = ArgumentParser(description="FJSP Heuristics")
     parser.add_argument(
@@ -16,6 +39,39 @@ def parse_arguments():
         help="the complete file path to the instance file(s)",
     )
 
+    parser.add_argument(
+        "-b",
+        "--batch",
+        type=str,
+        default="",
+        help="batch mode: a directory, a glob or an instances.json catalog of instances to solve",
+    )
+
+    parser.add_argument(
+        "-seeds",
+        "--seeds",
+        type=int,
+        nargs="+",
+        default=None,
+        help="seeds of every instance in batch mode (default: the '-seed' value)",
+    )
+
+    parser.add_argument(
+        "-bw",
+        "--batchworkers",
+        type=int,
+        default=1,
+        help="jobs run in parallel in batch mode",
+    )
+
+    parser.add_argument(
+        "-bt",
+        "--batchtimeout",
+        type=float,
+        default=0,
+        help="seconds after which a batch job is killed (0 = time limit plus 300)",
+    )
+
     parser.add_argument(
         "-m",
         "--method",
@@ -47,11 +103,126 @@ def parse_arguments():
         help="whether SBP processing logs should be written to a file.",
     )
 
+    parser.add_argument(
+        "-saev",
+        "--saevents",
+        type=str,
+        default="N",
+        choices=["Y", "N"],
+        help="whether SA iterations should be written as JSON lines records to a file",
+    )
+
+    parser.add_argument(
+        "-saprog",
+        "--saprogress",
+        type=str,
+        default="all",
+        choices=["all", "rate", "best"],
+        help="which SA iterations are shown on the console",
+    )
+
+    parser.add_argument(
+        "-saprograte",
+        "--saprogressrate",
+        type=_positive_float,
+        default=10.0,
+        help="maximum SA console updates per second in the 'rate' progress mode",
+    )
+
     parser.add_argument(
         "-seed", "--seed", type=int, default=42, help="wanted stochastic seed"
     )
 
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="number of SA chains, each one in its own process (1 = single chain)",
+    )
+
+    parser.add_argument(
+        "-pt",
+        "--tempering",
+        type=str,
+        default="N",
+        choices=["Y", "N"],
+        help="whether the SA runs as parallel tempering, with one replica per worker",
+    )
+
+    parser.add_argument(
+        "-sbpw",
+        "--sbpworkers",
+        type=int,
+        default=1,
+        help="worker processes to solve SBP bottleneck subproblems in parallel",
+    )
+
+    parser.add_argument(
+        "-sbpk",
+        "--sbpscreening",
+        type=int,
+        default=0,
+        help="machines kept by the lower bound screening of each SBP bottleneck search (0 = no screening)",
+    )
+
+    parser.add_argument(
+        "-sbpbb",
+        "--sbpcarlier",
+        type=str,
+        default="depth_first",
+        choices=["depth_first", "best_first"],
+        help="search mode of the Carlier solvers of the SBP",
+    )
+
+    parser.add_argument(
+        "-sbpnodes",
+        "--sbpcarliernodes",
+        type=int,
+        default=0,
+        help="node budget of the best-first Carlier search (0 = no budget, exact search)",
+    )
+
+    parser.add_argument(
+        "-mbulk",
+        "--modelbulk",
+        type=str,
+        default="N",
+        choices=["Y", "N"],
+        help="whether the CBC model is built in bulk as an lp file instead of constraint by constraint",
+    )
+
+    parser.add_argument(
+        "-mcache",
+        "--modelcache",
+        type=str,
+        default="",
+        help="folder where bulk built CBC models are cached by instance content (empty = no cache)",
+    )
+
     args = parser.parse_args()
+
+    if args.sbpcarliernodes < 0:
+        parser.error("the carlier node budget (-sbpnodes) can't be negative")
+
+    # the chains of the multi-chain SA don't log and run their SBP sequentially
+    if args.method != "cbc" and args.workers > 1 and args.tempering == "N":
+        options = _single_chain_options(args)
+        if options:
+            parser.error(
+                f"not supported by the multi-chain SA (-w > 1): {', '.join(options)}"
+            )
+
+    # parallel tempering needs 2 replicas, and they don't log either
+    if args.method != "cbc" and args.tempering == "Y":
+        if args.workers < 2:
+            parser.error("parallel tempering (-pt Y) needs at least 2 workers (-w)")
+        options = _single_chain_options(args)
+        if options:
+            parser.error(
+                f"not supported by parallel tempering (-pt Y): {', '.join(options)}"
+            )
+
     return args
 
 
@@ -68,16 +239,60 @@ def main(*, args: Namespace):
     logger.log("selected preferences:")
     with logger:
         logger.log(f"input path: {instance_path}")
+        if args.batch:
+            logger.log(f"batch source: {args.batch}")
+            logger.log(f"batch seeds: {args.seeds or [args.seed]}")
+            logger.log(f"batch workers: {args.batchworkers}")
         logger.log(f"output path: {output_data_path}")
         logger.log(f"method(s) to optimize FJSSP: {args.method}")
         logger.log(f"time limit: {args.timelimit}")
         logger.log(f"write SA logs? {'yes' if args.salogwriting == 'Y' else 'no'}")
         logger.log(f"write SBP logs? {'yes' if args.sbplogwriting == 'Y' else 'no'}")
+        logger.log(f"write SA events? {'yes' if args.saevents == 'Y' else 'no'}")
+        logger.log(f"SA console progress: {args.saprogress}")
         logger.log(f"randomness seed: {args.seed}")
+        logger.log(f"SA chains (workers): {args.workers}")
+        logger.log(f"parallel tempering? {'yes' if args.tempering == 'Y' else 'no'}")
+        logger.log(f"SBP workers: {args.sbpworkers}")
+        logger.log(f"SBP bottleneck screening: {args.sbpscreening or 'off'}")
+        logger.log(f"SBP carlier search: {args.sbpcarlier}")
+        logger.log(f"SBP carlier node budget: {args.sbpcarliernodes or 'off'}")
+        logger.log(f"bulk CBC model build? {'yes' if args.modelbulk == 'Y' else 'no'}")
+        logger.log(f"CBC model cache: {args.modelcache or 'off'}")
     logger.breakline()
 
     logger.log("starting program")
 
+    if args.batch:
+        instance_paths = app.collect_instances(args.batch)
+        seeds = args.seeds or [args.seed]
+
+        h = 1
+        with logger:
+            for message in app.run_batch(
+                instance_paths=instance_paths,
+                seeds=seeds,
+                method=args.method,
+                time_limit=args.timelimit,
+                output_folder_path=output_data_path,
+                logger=logger,
+                workers=args.batchworkers,
+                job_timeout=args.batchtimeout or None,
+                sbp_workers=args.sbpworkers,
+                sbp_screening_k=args.sbpscreening,
+                sbp_carlier_mode=args.sbpcarlier,
+                sbp_carlier_max_nodes=args.sbpcarliernodes,
+                sa_workers=args.workers,
+                sa_tempering=True if args.tempering == "Y" else False,
+                model_bulk_build=True if args.modelbulk == "Y" else False,
+                model_cache_dir=Path(args.modelcache) if args.modelcache else None,
+            ):
+                logger.log(f"[{h}] {message}")
+                h += 1
+
+        logger.log("finishing program")
+        return
+
     h = 1
     with logger:
         for message in app.run(
@@ -88,7 +303,18 @@ def main(*, args: Namespace):
             time_limit=args.timelimit,
             sa_log_writing=True if args.salogwriting == "Y" else False,
             sbp_log_writing=True if args.sbplogwriting == "Y" else False,
+            sa_events_writing=True if args.saevents == "Y" else False,
+            sa_progress=args.saprogress,
+            sa_progress_rate=args.saprogressrate,
+            sa_workers=args.workers,
+            sa_tempering=True if args.tempering == "Y" else False,
             seed=args.seed,
+            sbp_workers=args.sbpworkers,
+            sbp_screening_k=args.sbpscreening,
+            sbp_carlier_mode=args.sbpcarlier,
+            sbp_carlier_max_nodes=args.sbpcarliernodes,
+            model_bulk_build=True if args.modelbulk == "Y" else False,
+            model_cache_dir=Path(args.modelcache) if args.modelcache else None,
         ):
             logger.log(f"[{h}] {message}")
             h += 1
@@ -2,5 +2,6 @@ from . import instance
 from . import processing
 from . import exporting
 from .execution import run
+from .batch import run_batch, collect_instances
 
-__all__ = ["instance", "processing", "exporting", "run"]
+__all__ = ["instance", "processing", "exporting", "run", "run_batch", "collect_instances"]
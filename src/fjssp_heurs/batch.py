@@ -0,0 +1,184 @@
+from collections import deque
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+import glob
+import json
+import os
+import signal
+import time
+
+import pandas as pd
+
+from .execution import run
+from .utils.logger import LOGGER
+
+
+def collect_instances(source: str) -> list[Path]:
+    # 'source' is an instances.json catalog, a directory (searched recursively) or a glob
+    source_path = Path(source)
+
+    if source_path.suffix == ".json":
+        with open(source_path, "r") as file:
+            catalog = json.load(file)
+
+        paths = [source_path.parent / entry["path"] for entry in catalog]
+        # the catalog also lists instances that aren't shipped with the repository
+        return [path for path in paths if path.is_file()]
+
+    if source_path.is_dir():
+        return sorted(source_path.rglob("*.txt"))
+
+    return sorted(Path(path) for path in glob.glob(source, recursive=True))
+
+
+def _kill_job_group(process: Process, sig: int) -> None:
+    # the job leads its own process group, so solver and worker processes it started are
+    # signalled together with it. without process groups only the job itself is stopped
+    if not hasattr(os, "killpg"):
+        if process.is_alive():
+            process.terminate()
+        return
+
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _run_job(conn: Connection, job: dict, run_kwargs: dict) -> None:
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+
+    logger = LOGGER(log_path=os.devnull, out="off")
+
+    try:
+        job_output_path = Path(job["output"])
+        job_output_path.mkdir(parents=True, exist_ok=True)
+
+        for _ in run(
+            instance_path=Path(job["instance"]),
+            output_folder_path=job_output_path,
+            method=job["method"],
+            time_limit=job["time_limit"],
+            logger=logger,
+            sa_log_writing=False,
+            sbp_log_writing=False,
+            seed=job["seed"],
+            **run_kwargs,
+        ):
+            pass
+
+        results = pd.read_csv(
+            job_output_path / Path(job["instance"]).stem / "results.csv"
+        )
+        conn.send(("done", results.iloc[0].to_dict() if len(results) else dict()))
+    except Exception as e:
+        conn.send(("error", repr(e)))
+    finally:
+        conn.close()
+
+
+def run_batch(
+    *,
+    instance_paths: list[Path],
+    seeds: list[int],
+    method: str,
+    time_limit: float,
+    output_folder_path: Path,
+    logger: LOGGER,
+    workers: int = 1,
+    job_timeout: float = None,
+    **run_kwargs,
+):
+    # every (instance, seed) job runs 'execution.run' in its own process, with at most
+    # 'workers' jobs at a time. a job still running 'job_timeout' seconds after its start
+    # is killed with all its processes and recorded as a timeout
+    if job_timeout is None:
+        job_timeout = time_limit + 300
+
+    batch_output_path = output_folder_path / "batch"
+    batch_output_path.mkdir(parents=True, exist_ok=True)
+    results_path = batch_output_path / "batch_results.csv"
+
+    jobs = deque(
+        {
+            "id": job_id,
+            "instance": str(instance_path),
+            "seed": seed,
+            "method": method,
+            "time_limit": time_limit,
+            "output": str(batch_output_path / f"seed_{seed}"),
+        }
+        for job_id, (instance_path, seed) in enumerate(
+            (instance_path, seed) for instance_path in instance_paths for seed in seeds
+        )
+    )
+    num_jobs = len(jobs)
+
+    yield f"batch of {num_jobs} jobs ({len(instance_paths)} instances x {len(seeds)} seeds) | workers: {workers} | job timeout: {job_timeout} s"
+
+    rows = []
+    running = dict()  # connection -> (job, process, start time)
+
+    try:
+        while jobs or running:
+            while jobs and len(running) < workers:
+                job = jobs.popleft()
+                parent_conn, child_conn = Pipe(duplex=False)
+                process = Process(target=_run_job, args=(child_conn, job, run_kwargs))
+                process.start()
+                child_conn.close()
+                running[parent_conn] = (job, process, time.monotonic())
+
+            wait(list(running), timeout=1.0)
+
+            for conn in list(running):
+                job, process, start = running[conn]
+                elapsed = time.monotonic() - start
+
+                if conn.poll():
+                    try:
+                        status, payload = conn.recv()
+                    except EOFError:
+                        status, payload = "crashed", f"exit code {process.exitcode}"
+                elif not process.is_alive():
+                    status, payload = "crashed", f"exit code {process.exitcode}"
+                elif elapsed > job_timeout:
+                    _kill_job_group(process, signal.SIGTERM)
+                    status, payload = "timeout", None
+                else:
+                    continue
+
+                if status != "done":
+                    # whatever is left of a killed or crashed job, even a stuck leader
+                    process.join(timeout=10)
+                    _kill_job_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+                process.join()
+                conn.close()
+                del running[conn]
+
+                row = {
+                    "instance": Path(job["instance"]).stem,
+                    "seed": job["seed"],
+                    "method": method,
+                    "status": status,
+                    "wall time": round(elapsed, 4),
+                    "error": payload if status != "done" else None,
+                }
+                if status == "done":
+                    row.update(payload)
+                rows.append(row)
+
+                # rewritten after every job, so an interrupted batch keeps finished jobs
+                pd.DataFrame(rows).sort_values(["instance", "seed"]).to_csv(
+                    results_path, index=False
+                )
+
+                yield f"job {len(rows)}/{num_jobs} | {row['instance']} (seed {row['seed']}) | {status} | {elapsed:.2f} s"
+    finally:
+        # jobs run in their own process groups, out of reach of a ctrl+c on the batch
+        for _, process, _ in running.values():
+            _kill_job_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+    yield f"batch finished, consolidated results in {results_path}"
@@ -1,18 +1,58 @@
+from multiprocessing import Pipe, Process, Value
 from pathlib import Path
 import pandas as pd
 
 from .processing.metaheuristic.solution import Solution
 from .processing.metaheuristic.solbuilder import SolutionBuilder
 from .instance.instance import Instance
-from .processing.model import MathModel
+from .processing.model import MathModel, solve_in_process
 from .utils.logger import LOGGER
 from .processing.metaheuristic.sa import SimulatedAnnealing
+from .processing.metaheuristic.multichain import MultiChainSimulatedAnnealing
+from .processing.metaheuristic.tempering import ParallelTempering
 from .utils.graph import FJSSPGraph
 from .processing.metaheuristic.sbp.sbp import ShiftingBottleneck
 from .processing.metaheuristic.localsearch import LocalSearch
 from .utils.gap import evaluate_gap
 
 
+def _report_solver_solution(
+    *,
+    math_model: MathModel,
+    solver_result: tuple,
+    inst: Instance,
+    inst_gantts_path: Path,
+    inst_dags_path: Path,
+    logger: LOGGER,
+    results_df: pd.DataFrame,
+):
+    solver_feasible, solver_makespan, solver_time, solver_gap = solver_result
+
+    if solver_feasible:
+        yield "printing solver solution"
+        math_model.print(print_style="arrays")
+
+        logger.breakline()
+
+        yield "saving solver solution' gantt graph"
+        math_model.save_gantt(gantt_output_path=inst_gantts_path)
+
+        yield "creating and writing solver solution's DAG"
+        math_model.create_graph(tech_disjunc=True)
+        math_model.export_dag(
+            dag_output_path=inst_dags_path,
+            title=f"{inst._instance_name} - solver solution",
+            show="real disjunctives",
+        )
+
+        results_df["solver makespan"] = [solver_makespan]
+        results_df["solver time"] = [solver_time]
+        results_df["solver gap"] = [solver_gap]
+
+    else:
+        yield "solver optimization didn't reach a feasible solution"
+
+
 def run(
     *,
     instance_path: Path,
@@ -22,7 +62,18 @@ def run(
     logger: LOGGER,
     sa_log_writing: bool,
     sbp_log_writing: bool,
+    sa_events_writing: bool = False,
+    sa_progress: str = "all",
+    sa_progress_rate: float = 10.0,
+    sa_workers: int = 1,
+    sa_tempering: bool = False,
     seed: int = 42,
+    sbp_workers: int = 1,
+    sbp_screening_k: int = 0,
+    sbp_carlier_mode: str = "depth_first",
+    sbp_carlier_max_nodes: int = 0,
+    model_bulk_build: bool = False,
+    model_cache_dir: Path = None,
 ):
     inst = Instance(instance_path)
     results_df = pd.DataFrame()
@@ -52,129 +103,268 @@ def run(
     )
     yield f"created and saved '{inst._instance_name}' instance's DAGs and parameters read, check {instance_output_path}"
 
-    if method == "cbc" or method == "both":
+    if method == "cbc":
         logger.breakline()
         yield "solving FJSSP with CBC solver"
 
         with logger:
+            yield "building a constructive solution as MIP start"
+            start_sol = Solution(instance=inst, logger=logger)
+            builder = SolutionBuilder(logger=logger, seed=seed)
+            builder.define_hiperparams(alpha_grasp=0.35)
+            builder.build_solution(
+                solution=start_sol,
+                machines_strategy="grasp",
+                scheduler_approach="machine_by_machine",
+            )
+
             yield "creating FJSSP mathematical model"
-            math_model = MathModel(instance=inst, logger=logger)
+            # the start's makespan bounds the model's horizon
+            math_model = MathModel(
+                instance=inst,
+                logger=logger,
+                upper_bound=start_sol._makespan,
+                bulk_build=model_bulk_build,
+                cache_dir=model_cache_dir,
+            )
 
             yield f"optimizing mathematical model | time limit = {time_limit} s"
             with logger:
-                solver_feasible, solver_makespan, solver_time, solver_gap = (
-                    math_model.optimize(verbose=0, time_limit=time_limit)
-                )
-
-            if solver_feasible:
-                yield "printing solver solution"
-                math_model.print(print_style="arrays")
-
-                logger.breakline()
-
-                yield "saving solver solution' gantt graph"
-                math_model.save_gantt(gantt_output_path=inst_gantts_path)
-
-                yield "creating and writing solver solution's DAG"
-                math_model.create_graph(tech_disjunc=True)
-                math_model.export_dag(
-                    dag_output_path=inst_dags_path,
-                    title=f"{inst._instance_name} - solver solution",
-                    show="real disjunctives",
+                solver_result = math_model.optimize(
+                    verbose=0, time_limit=time_limit, start=start_sol
                 )
 
-                results_df["solver makespan"] = [solver_makespan]
-                results_df["solver time"] = [solver_time]
-                results_df["solver gap"] = [solver_gap]
+            yield from _report_solver_solution(
+                math_model=math_model,
+                solver_result=solver_result,
+                inst=inst,
+                inst_gantts_path=inst_gantts_path,
+                inst_dags_path=inst_dags_path,
+                logger=logger,
+                results_df=results_df,
+            )
 
-            else:
-                yield "solver optimization didn't reach a feasible solution"
+    # the cbc child of the both method never outlives the run, even when the SA raises
+    # or this generator is closed early
+    solver_process = None
+    try:
+        if method == "SA" or method == "both":
+            logger.breakline()
+            yield "solving FJSSP with heuristic approach"
 
-    if method == "SA" or method == "both":
-        logger.breakline()
-        yield "solving FJSSP with heuristic approach"
+            with logger:
+                sol = Solution(instance=inst, logger=logger)
+                yield "built a solution representation"
 
-        with logger:
-            sol = Solution(instance=inst, logger=logger)
-            yield "built a solution representation"
+                yield "building a feasible initial solution with constructive heuristic"
+                builder = SolutionBuilder(logger=logger, seed=seed)
+                builder.define_hiperparams(alpha_grasp=0.35)
 
-            yield "building a feasible initial solution with constructive heuristic"
-            builder = SolutionBuilder(logger=logger, seed=seed)
-            builder.define_hiperparams(alpha_grasp=0.35)
+                builder.build_solution(
+                    solution=sol,
+                    machines_strategy="grasp",
+                    scheduler_approach="machine_by_machine",
+                )
 
-            builder.build_solution(
-                solution=sol,
-                machines_strategy="grasp",
-                scheduler_approach="machine_by_machine",
-            )
+                # with both methods, cbc runs in a child process while the SA runs here.
+                # SA improvements are published as the cbc cutoff, so cbc only looks for
+                # better ones
+                publish_cutoff = None
+                if method == "both":
+                    yield f"starting CBC solver in a separate process, concurrently with SA | cutoff = {sol._makespan}"
+
+                    solver_cutoff = Value("d", sol._makespan)
+                    solver_conn, child_conn = Pipe(duplex=False)
+                    solver_process = Process(
+                        target=solve_in_process,
+                        args=(
+                            child_conn,
+                            inst,
+                            time_limit,
+                            solver_cutoff,
+                            sol.snapshot(),
+                            model_bulk_build,
+                            model_cache_dir,
+                        ),
+                    )
+                    solver_process.start()
+                    child_conn.close()
+
+                    def publish_cutoff(makespan: float) -> None:
+                        solver_cutoff.value = min(solver_cutoff.value, makespan)
+
+                results_df["constr.heur makespan"] = [sol._makespan]
+                results_df["constr.heur gap"] = [
+                    evaluate_gap(ub=sol._makespan, lb=inst.optimal_solution)
+                ]
 
-            results_df["constr.heur makespan"] = [sol._makespan]
-            results_df["constr.heur gap"] = [
-                evaluate_gap(ub=sol._makespan, lb=inst.optimal_solution)
-            ]
+                logger.breakline()
 
-            logger.breakline()
+                yield "printing built initial solution"
+                sol.print(
+                    print_style="arrays",
+                )
 
-            yield "printing built initial solution"
-            sol.print(
-                print_style="arrays",
-            )
+                logger.breakline()
 
-            logger.breakline()
+                yield "saving built initial solution' gantt graph"
+                sol.save_gantt(
+                    gantt_output=inst_gantts_path,
+                    gantt_title="constructive heur solution",
+                )
 
-            yield "saving built initial solution' gantt graph"
-            sol.save_gantt(
-                gantt_output=inst_gantts_path, gantt_title="constructive heur solution"
-            )
+                yield "creating and writing initial solution's DAG"
+                sol.create_graph(tech_disjunc=True, graph_type="complete fjssp")
+                sol.export_dag(
+                    dag_output_path=inst_dags_path,
+                    title=f"{inst._instance_name} - constructive heuristic initial solution",
+                    show="visual disjunctives",
+                )
 
-            yield "creating and writing initial solution's DAG"
-            sol.create_graph(tech_disjunc=True, graph_type="complete fjssp")
-            sol.export_dag(
-                dag_output_path=inst_dags_path,
-                title=f"{inst._instance_name} - constructive heuristic initial solution",
-                show="visual disjunctives",
-            )
+                yield "preparing simulated annealing initial solution"
+                sa_sol = Solution(instance=inst, logger=logger)
+                sa_sol.copy_solution(sol=sol)
+
+                if sa_tempering:
+                    yield f"starting parallel tempering optimization | replicas: {sa_workers}"
+                    tempering = ParallelTempering(
+                        logger=logger,
+                        replicas=sa_workers,
+                        max_time=time_limit,
+                        sbp_screening_k=(
+                            sbp_screening_k if sbp_screening_k > 0 else None
+                        ),
+                        sbp_carlier_mode=sbp_carlier_mode,
+                        sbp_carlier_max_nodes=sbp_carlier_max_nodes or None,
+                        on_new_best=publish_cutoff,
+                        seed=seed,
+                    )
+
+                    sa_sol, sa_time, sa_gap = tempering.optimize(solution=sa_sol)
+                elif sa_workers > 1:
+                    yield f"starting multi-chain SA optimization | chains: {sa_workers}"
+                    multichain_sa = MultiChainSimulatedAnnealing(
+                        logger=logger,
+                        chains=sa_workers,
+                        max_time=time_limit,
+                        sbp_screening_k=(
+                            sbp_screening_k if sbp_screening_k > 0 else None
+                        ),
+                        sbp_carlier_mode=sbp_carlier_mode,
+                        sbp_carlier_max_nodes=sbp_carlier_max_nodes or None,
+                        on_new_best=publish_cutoff,
+                        seed=seed,
+                    )
+
+                    sa_sol, sa_time, sa_gap = multichain_sa.optimize(solution=sa_sol)
+                else:
+                    yield "starting SA optimization"
+                    sbp_solver = ShiftingBottleneck(
+                        log_out="off" if not sbp_log_writing else "file",
+                        workers=sbp_workers,
+                        screening_k=sbp_screening_k if sbp_screening_k > 0 else None,
+                        carlier_mode=sbp_carlier_mode,
+                        carlier_max_nodes=sbp_carlier_max_nodes or None,
+                    )
+                    sa = SimulatedAnnealing(
+                        local_search=LocalSearch(logger=logger, seed=seed),
+                        log_writing=sa_log_writing,
+                        events_writing=sa_events_writing,
+                        progress=sa_progress,
+                        progress_rate=sa_progress_rate,
+                        max_time=time_limit,
+                        sbp_solver=sbp_solver,
+                        exchange=(
+                            (lambda best: publish_cutoff(best._makespan))
+                            if publish_cutoff is not None
+                            else None
+                        ),
+                        exchange_interval=5.0,
+                        seed=seed,
+                    )
+
+                    sa_sol, sa_time, sa_gap = sa.optimize(solution=sa_sol)
+                    sbp_solver.close()
+
+                results_df["SA makespan"] = [sa_sol._makespan]
+                results_df["SA time"] = [sa_time]
+                results_df["SA gap"] = [sa_gap]
 
-            yield "preparing simulated annealing initial solution"
-            sa_sol = Solution(instance=inst, logger=logger)
-            sa_sol.copy_solution(sol=sol)
-
-            yield "starting SA optimization"
-            sa = SimulatedAnnealing(
-                local_search=LocalSearch(logger=logger, seed=seed),
-                log_writing=sa_log_writing,
-                max_time=time_limit,
-                sbp_solver=ShiftingBottleneck(
-                    log_out="off" if not sbp_log_writing else "file"
-                ),
-                seed=seed,
-            )
+                logger.breakline()
 
-            sa_sol, sa_time, sa_gap = sa.optimize(solution=sa_sol)
+                yield "printing SA solution"
+                sa_sol.print(print_style="arrays")
 
-            results_df["SA makespan"] = [sa_sol._makespan]
-            results_df["SA time"] = [sa_time]
-            results_df["SA gap"] = [sa_gap]
+                logger.breakline()
 
-            logger.breakline()
+                yield "saving SA solution' gantt graph"
+                sa_sol.save_gantt(
+                    gantt_output=inst_gantts_path, gantt_title="SA best solution"
+                )
 
-            yield "printing SA solution"
-            sa_sol.print(print_style="arrays")
+                yield "creating and writing SA solution's DAG"
+                sa_sol.create_graph(tech_disjunc=False, graph_type="complete fjssp")
+                sa_sol.export_dag(
+                    dag_output_path=inst_dags_path,
+                    title=f"{inst._instance_name} - SA best solution",
+                    show="visual disjunctives",
+                )
 
+        if solver_process is not None:
             logger.breakline()
+            yield "waiting for the CBC solver process"
 
-            yield "saving SA solution' gantt graph"
-            sa_sol.save_gantt(
-                gantt_output=inst_gantts_path, gantt_title="SA best solution"
-            )
+            with logger:
+                solver_cutoff.value = min(solver_cutoff.value, sa_sol._makespan)
+                try:
+                    result = solver_conn.recv()
+                except EOFError:
+                    result = None
+                solver_process.join()
+
+                # a child that died or exited with an error counts as a failed cbc run
+                if result is None or solver_process.exitcode != 0:
+                    result = None
+                    yield f"CBC solver failed | exit code: {solver_process.exitcode}"
+                else:
+                    math_model = MathModel(
+                        instance=inst, logger=logger, build_model=False
+                    )
+                    solver_result = math_model.load_result(result)
+                    yield (
+                        f"CBC solver finished | makespan: {result['makespan']} | "
+                        f"last cutoff: {result['cutoff']} | proven: {result['proven']}"
+                    )
+
+                    yield from _report_solver_solution(
+                        math_model=math_model,
+                        solver_result=solver_result,
+                        inst=inst,
+                        inst_gantts_path=inst_gantts_path,
+                        inst_dags_path=inst_dags_path,
+                        logger=logger,
+                        results_df=results_df,
+                    )
+
+            # the cbc incumbent only exists when it beats the SA's best makespan
+            if (
+                result is not None
+                and result["makespan"] is not None
+                and result["makespan"] < sa_sol._makespan
+            ):
+                results_df["best makespan"] = [result["makespan"]]
+                results_df["best method"] = ["cbc"]
+            else:
+                results_df["best makespan"] = [sa_sol._makespan]
+                results_df["best method"] = ["SA"]
+            results_df["best proven optimal"] = [
+                result is not None and result["proven"]
+            ]
 
-            yield "creating and writing SA solution's DAG"
-            sa_sol.create_graph(tech_disjunc=False, graph_type="complete fjssp")
-            sa_sol.export_dag(
-                dag_output_path=inst_dags_path,
-                title=f"{inst._instance_name} - SA best solution",
-                show="visual disjunctives",
-            )
+    finally:
+        if solver_process is not None and solver_process.is_alive():
+            solver_process.terminate()
+            solver_process.join()
 
     logger.breakline()
 
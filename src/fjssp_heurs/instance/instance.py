@@ -2,6 +2,8 @@ from pathlib import Path
 import os
 import json
 
+import numpy as np
+
 from ..utils.logger import LOGGER
 
 
@@ -22,6 +24,7 @@ class Instance:
         self.M_i = dict()  # M_i[i]: máquinas elegíveis para operação i
         self.p = dict()  # p[(i, m)]: tempo de processamento da operação i na máquina m
         self.job_of_op = dict()  # job que contém a operação i
+        self.pos_in_job = dict()  # posição da operação i na sequência tecnológica do seu job
         self.O_j = []  # lista de operações para cada job
         self.P_j = []  # precedência (i, i') entre operações de um job
         self.O_m = dict()  # O_m[m]: operações que podem ser feitas na máquina m
@@ -48,6 +51,7 @@ class Instance:
                     machine_options = []
                     op_id = op_counter
                     self.job_of_op[op_id] = j
+                    self.pos_in_job[op_id] = len(job_ops)
                     self.M_i[op_id] = set()
 
                     for _ in range(num_machines):
@@ -80,6 +84,11 @@ class Instance:
         for job in range(self.num_jobs):
             self.S_j[job] = [i for (i, _) in self.P_j[job]] + [self.P_j[job][-1][1]]
 
+        # p_matrix[i, m]: padded processing times (inf where 'm' isn't eligible for 'i')
+        self.p_matrix = np.full((len(self.O), self.num_machines), np.inf)
+        for (i, m), time in self.p.items():
+            self.p_matrix[i, m] = time
+
     def print(self, *, logger: LOGGER, type: str = "sets") -> None:
         logger.log(f"#jobs: {self.num_jobs} | #machines: {self.num_machines}\n")
 
@@ -62,6 +62,28 @@ class LocalSearch:
         """
         return sol_hash in self.tabu and move in self.tabu[sol_hash]["tabu_moves"]
 
+    def _critical_queue(self, sol: Solution) -> tuple[list[int], list[int]]:
+        """
+        Builds the tabu queue of a solution from the critical blocks of one of its critical paths.
+
+        The flexible critical operations are shuffled, and then those at either end of their
+        block are moved to the end of the queue, which is popped first: as in the block
+        neighborhoods of the JSSP, these moves shorten a block without splitting it.
+
+        Args:
+            sol: The Solution whose critical path is used.
+
+        Returns:
+            The critical path and the queue of its flexible operations.
+        """
+        critical_path, _, critical_blocks = sol._find_a_critical_path()
+        block_ends = {op for block in critical_blocks for op in (block[0], block[-1])}
+
+        queue = [op for op in critical_path if len(sol._instance.M_i[op]) > 1]
+        random.shuffle(queue)
+        queue.sort(key=lambda op: op in block_ends)
+        return critical_path, queue
+
     def generate_adaptive_neighbor_with_tabu(
         self,
         sol: Solution,
@@ -86,8 +108,7 @@ class LocalSearch:
         logger = self._logger
 
         logger.breakline()
-        sol_scheduling = tuple(tuple(sublist) for sublist in sol._machine_sequence)
-        sol_hash = hash(sol_scheduling)
+        sol_hash = sol.sequence_key()
 
         logger.log(
             f"generating a neighbor from: sol: {sol._makespan} | sol_hash: {sol_hash} | intensity: {intensity_level} | T_rel: {T_rel}"
@@ -109,17 +130,13 @@ class LocalSearch:
 
             if sol_hash not in self.tabu:
                 logger.log("brand new solution hash, adding it on tabu...")
-                critical_path, _ = sol._find_a_critical_path()
-                critical_path_with_flex = [
-                    op for op in critical_path if len(sol._instance.M_i[op]) > 1
-                ]
+                critical_path, critical_path_with_flex = self._critical_queue(sol)
 
                 if not critical_path_with_flex:
                     with logger:
                         logger.log("new solution hash with no flexible critical ops..")
                     return None, None
 
-                random.shuffle(critical_path_with_flex)
                 self.tabu[sol_hash] = {
                     "queue": deque(critical_path_with_flex),
                     "tabu_moves": deque(
@@ -133,17 +150,13 @@ class LocalSearch:
                 }
             elif not self.tabu[sol_hash]["queue"]:
                 logger.log("known solution but with no queue left, rewriting it...")
-                critical_path, _ = sol._find_a_critical_path()
-                critical_path_with_flex = [
-                    op for op in critical_path if len(sol._instance.M_i[op]) > 1
-                ]
+                critical_path, critical_path_with_flex = self._critical_queue(sol)
                 if not critical_path_with_flex:
                     with logger:
                         logger.log(
                             "known solution hash with no flexible critical ops.."
                         )
                     return None, None
-                random.shuffle(critical_path_with_flex)
                 self.tabu[sol_hash]["queue"] = deque(critical_path_with_flex)
                 logger.log(
                     f"[tabu] reshuffling a critical path for sol {sol_hash}: {critical_path}"
@@ -214,11 +227,9 @@ class LocalSearch:
                             moves_made.append((op, new_machine))
 
                 if moves_made:
-                    neighbor_sol._machine_sequence = (
-                        neighbor_sol._get_machines_assignment()
-                    )
-                    neighbor_sol.create_graph(
-                        tech_disjunc=False, graph_type="partial fjssp"
+                    neighbor_sol._sequence_by_assignment()
+                    neighbor_sol.patch_graph(
+                        parent=sol, moves=moves_made, tech_disjunc=False
                     )
 
                     if self._sbp:
@@ -278,7 +289,7 @@ class LocalSearch:
         logger.breakline()
 
         eligible_machines = instance.M_i[op]
-        current_machine = sol._assign_vect[op]
+        current_machine = int(sol._assign_vect[op])
         alternatives = [m for m in eligible_machines if m != current_machine]
 
         if not alternatives:
@@ -297,7 +308,7 @@ class LocalSearch:
             move = (op, int(new_machine))
             if not self._is_tabu(sol_hash, move):
                 logger.log(f"[tabu] move accepted: op {op} -> m{new_machine}")
-                neighbor_sol._assign_vect[op] = new_machine
+                neighbor_sol.assign(op, new_machine)
                 return op, int(new_machine)
             else:
                 logger.log(f"[tabu] move {move} is tabu")
@@ -0,0 +1,274 @@
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import Manager
+from typing import Callable
+import os
+
+import numpy as np
+
+from ...instance.instance import Instance
+from ...utils.logger import LOGGER
+from ...utils.crono import Crono
+from ...utils.gap import evaluate_gap
+from .solution import Solution
+from .localsearch import LocalSearch
+from .sa import SimulatedAnnealing
+from .sbp.sbp import ShiftingBottleneck
+
+
+class _EliteExchange:
+    """
+    Exchange callback of a single chain, backed by an elite shared by all chains.
+
+    Every call publishes the chain's best solution when it beats the elite. A chain whose best
+    is worse than the elite by more than `lag_tolerance` restarts from the elite.
+    """
+
+    def __init__(
+        self,
+        chain_id: int,
+        instance: Instance,
+        logger: LOGGER,
+        elite,
+        lock,
+        restart_lagging: bool,
+        lag_tolerance: float,
+    ) -> None:
+        self.chain_id = chain_id
+        self.instance = instance
+        self.logger = logger
+        self.elite = elite
+        self.lock = lock
+        self.restart_lagging = restart_lagging
+        self.lag_tolerance = lag_tolerance
+        self.exchanges: int = 0
+        self.restarts: int = 0
+
+    def __call__(self, best_solution: Solution) -> Solution:
+        self.exchanges += 1
+
+        with self.lock:
+            elite_makespan = self.elite.get("makespan", float("inf"))
+            if best_solution._makespan < elite_makespan:
+                self.elite["state"] = best_solution.snapshot()
+                self.elite["chain"] = self.chain_id
+                self.elite["makespan"] = best_solution._makespan
+                return None
+
+            if not self.restart_lagging or best_solution._makespan <= elite_makespan * (
+                1 + self.lag_tolerance
+            ):
+                return None
+
+            state = self.elite["state"]
+
+        self.restarts += 1
+        elite = Solution(instance=self.instance, logger=self.logger)
+        elite.restore(state)
+        return elite
+
+
+def _run_chain(
+    chain_id: int,
+    instance: Instance,
+    state: dict,
+    seed: int,
+    max_time: float,
+    elite,
+    lock,
+    exchange_interval: float,
+    restart_lagging: bool,
+    lag_tolerance: float,
+    sbp_screening_k: int,
+    sbp_carlier_mode: str,
+    sbp_carlier_max_nodes: int,
+    sa_params: dict,
+) -> dict:
+    # runs in a worker process: chains are silent and only report their best solution
+    logger = LOGGER(log_path=os.devnull, out="off")
+
+    solution = Solution(instance=instance, logger=logger)
+    solution.restore(state)
+
+    exchange = _EliteExchange(
+        chain_id=chain_id,
+        instance=instance,
+        logger=logger,
+        elite=elite,
+        lock=lock,
+        restart_lagging=restart_lagging,
+        lag_tolerance=lag_tolerance,
+    )
+
+    sbp_solver = ShiftingBottleneck(
+        log_out="off",
+        screening_k=sbp_screening_k,
+        carlier_mode=sbp_carlier_mode,
+        carlier_max_nodes=sbp_carlier_max_nodes,
+    )
+    sa = SimulatedAnnealing(
+        local_search=LocalSearch(logger=logger, seed=seed),
+        sbp_solver=sbp_solver,
+        exchange=exchange,
+        max_time=max_time,
+        exchange_interval=exchange_interval,
+        seed=seed,
+        **sa_params,
+    )
+
+    best_solution, runtime, _ = sa.optimize(solution=solution)
+    sbp_solver.close()
+
+    return {
+        "chain": chain_id,
+        "seed": seed,
+        "state": best_solution.snapshot(),
+        "makespan": best_solution._makespan,
+        "runtime": runtime,
+        "iterations": sa.current_iteration,
+        "exchanges": exchange.exchanges,
+        "restarts": exchange.restarts,
+    }
+
+
+class MultiChainSimulatedAnnealing:
+    """
+    Runs independent Simulated Annealing chains in worker processes for the FJSSP.
+
+    Each chain has its own seed, spawned from a single seed sequence, and the chains share an
+    elite solution every `exchange_interval` seconds. Lagging chains may restart from it.
+    """
+
+    def __init__(
+        self,
+        logger: LOGGER,
+        chains: int = 2,
+        max_time: int = 300,
+        exchange_interval: float = 10.0,
+        restart_lagging: bool = True,
+        lag_tolerance: float = 0.02,
+        sbp_screening_k: int = None,
+        sbp_carlier_mode: str = "depth_first",
+        sbp_carlier_max_nodes: int = None,
+        on_new_best: Callable[[float], None] = None,
+        seed: int = 42,
+        **sa_params,
+    ) -> None:
+        """
+        Initializes the multi-chain optimizer.
+
+        Args:
+            logger: Logger for the main process; chains themselves don't log.
+            chains: Number of SA chains, each one running in its own process.
+            max_time: Maximum runtime in seconds of every chain.
+            exchange_interval: Seconds between two exchanges with the shared elite.
+            restart_lagging: Whether chains lagging behind the elite restart from it.
+            lag_tolerance: Relative makespan gap to the elite above which a chain is lagging.
+            sbp_screening_k: Bottleneck screening of every chain's SBP (None disables it).
+            sbp_carlier_mode: Search mode of the Carlier solvers of every chain's SBP.
+            sbp_carlier_max_nodes: Node budget of the best-first Carlier search (None for no limit).
+            on_new_best: Called with the elite makespan whenever it improves, checked every
+                `exchange_interval` seconds while the chains run.
+            seed: Root seed from which every chain's seed is spawned.
+            **sa_params: Extra keyword arguments given to every `SimulatedAnnealing`.
+        """
+        self.logger: LOGGER = logger
+        self.chains: int = chains
+        self.max_time: int = max_time
+        self.exchange_interval: float = exchange_interval
+        self.restart_lagging: bool = restart_lagging
+        self.lag_tolerance: float = lag_tolerance
+        self.sbp_screening_k: int = sbp_screening_k
+        self.sbp_carlier_mode: str = sbp_carlier_mode
+        self.sbp_carlier_max_nodes: int = sbp_carlier_max_nodes
+        self.on_new_best: Callable[[float], None] = on_new_best
+        self.sa_params: dict = sa_params
+
+        self.seeds: list[int] = [
+            int(child.generate_state(1)[0])
+            for child in np.random.SeedSequence(seed).spawn(chains)
+        ]
+        self.results: list[dict] = []
+
+    def optimize(self, solution: Solution) -> tuple[Solution, float, float]:
+        """
+        Runs every chain from the given solution and keeps the best solution among them.
+
+        Args:
+            solution: The initial Solution object shared by all chains.
+
+        Returns:
+            The best Solution, the total runtime in seconds and its gap to the known optimum.
+        """
+        logger = self.logger
+        instance = solution._instance
+        timer = Crono()
+
+        with logger:
+            logger.log(
+                f"multi-chain SA has started | chains: {self.chains} | "
+                f"exchange interval: {self.exchange_interval} s | "
+                f"restart lagging chains: {self.restart_lagging}"
+            )
+
+            state = solution.snapshot()
+
+            with Manager() as manager:
+                elite = manager.dict(makespan=solution._makespan, chain=-1, state=state)
+                lock = manager.Lock()
+
+                with ProcessPoolExecutor(max_workers=self.chains) as pool:
+                    futures = [
+                        pool.submit(
+                            _run_chain,
+                            chain_id,
+                            instance,
+                            state,
+                            seed,
+                            self.max_time,
+                            elite,
+                            lock,
+                            self.exchange_interval,
+                            self.restart_lagging,
+                            self.lag_tolerance,
+                            self.sbp_screening_k,
+                            self.sbp_carlier_mode,
+                            self.sbp_carlier_max_nodes,
+                            self.sa_params,
+                        )
+                        for chain_id, seed in enumerate(self.seeds)
+                    ]
+
+                    best_makespan = solution._makespan
+                    while wait(futures, timeout=self.exchange_interval).not_done:
+                        if self.on_new_best is not None and (
+                            elite["makespan"] < best_makespan
+                        ):
+                            best_makespan = elite["makespan"]
+                            self.on_new_best(best_makespan)
+
+                    self.results = [future.result() for future in futures]
+
+            with logger:
+                for result in self.results:
+                    logger.log(
+                        f"chain {result['chain']} | seed: {result['seed']} | "
+                        f"best: {result['makespan']} | its: {result['iterations']} | "
+                        f"restarts from elite: {result['restarts']}"
+                    )
+
+            # ties go to the smallest chain id
+            best = min(self.results, key=lambda result: result["makespan"])
+            best_solution = Solution(instance=instance, logger=solution._logger)
+            best_solution.restore(best["state"])
+
+            runtime = timer.elapsed_time()
+            logger.log(
+                f"multi-chain SA finished | best: {best_solution._makespan} "
+                f"(chain {best['chain']}) | runtime: {runtime:.2f}s"
+            )
+
+        return (
+            best_solution,
+            runtime,
+            evaluate_gap(ub=best_solution._makespan, lb=instance.optimal_solution),
+        )
@@ -1,5 +1,7 @@
 from math import exp
 from copy import copy
+from collections import deque
+from typing import Callable
 
 import numpy as np
 
@@ -12,6 +14,22 @@ from .solbuilder import SolutionBuilder
 from .sbp.sbp import ShiftingBottleneck
 
 
+def metropolis_acceptance(delta: float, temperature: float) -> tuple[bool, float, float]:
+    """
+    Metropolis acceptance rule for a worsening move.
+
+    Args:
+        delta: Objective improvement of the move (negative when it worsens the solution).
+        temperature: Temperature at which the move is evaluated.
+
+    Returns:
+        Whether the move is accepted, its acceptance probability and the random number drawn.
+    """
+    acceptance_prob = exp(delta / temperature)
+    rand = np.random.uniform(0, 1)
+    return rand < acceptance_prob, acceptance_prob, rand
+
+
 class SimulatedAnnealing:
     """
     Implements the Simulated Annealing (SA) metaheuristic for solving the Flexible Job Shop Scheduling Problem (FJSSP).
@@ -31,6 +49,13 @@ class SimulatedAnnealing:
         final_temperature: float = 0.01,
         max_time: int = 300,
         log_writing: bool = False,
+        events_writing: bool = False,
+        progress: str = "all",
+        progress_rate: float = 10.0,
+        trace_size: int = 0,
+        grasp_candidates: int = 8,
+        exchange: Callable[[Solution], Solution] = None,
+        exchange_interval: float = 10.0,
         seed: int = 42,
     ) -> None:
         """
@@ -45,6 +70,15 @@ class SimulatedAnnealing:
             final_temperature: Stopping temperature criterion.
             max_time: Maximum runtime in seconds.
             log_writing: Whether to print detailed logs to a file.
+            events_writing: Whether to write one JSON record per iteration to 'saevents.jsonl'.
+            progress: Which iterations are shown on the console: 'all', 'rate' (at most
+                `progress_rate` lines per second) or 'best' (only new best solutions).
+            progress_rate: Maximum console updates per second in the 'rate' progress mode.
+            trace_size: Number of most recent iteration records kept in `trace` (0 keeps none).
+            grasp_candidates: Number of GRASP solutions sampled on each restart; the best one is kept.
+            exchange: Optional callback invoked every `exchange_interval` seconds with the best
+                solution. When it returns a solution, the search restarts from it.
+            exchange_interval: Seconds between two calls of `exchange`.
             seed: Randomness seed.
         """
         self._sbp = sbp_solver
@@ -52,11 +86,15 @@ class SimulatedAnnealing:
         self.local_search._define_jssp_solver(sbp=self._sbp)
 
         self.logger: LOGGER = LOGGER(
-            log_path="salog.log", out=("file" if log_writing else "off")
+            log_path="salog.log",
+            out=("file" if log_writing else "off"),
+            buffer_lines=256,
+            events_path="saevents.jsonl" if events_writing else None,
         )
         # preserve the original logger from local_search for main console output
         self.old_logger: LOGGER = copy(self.local_search._logger)
         self.old_logger.level -= 1  # Adjust level for cleaner output
+        self.old_logger.buffer_lines = 256  # per-iteration lines are written in batches
         self.local_search._logger = (
             self.logger
         )  # redirect local search logs to SA's file logger
@@ -76,6 +114,22 @@ class SimulatedAnnealing:
 
         self.max_time: int = max_time
         self.log_writing: bool = log_writing
+        self.events_writing: bool = events_writing
+
+        if progress not in ["all", "rate", "best"]:
+            raise ValueError(f"unknown progress mode: '{progress}'")
+        if progress_rate <= 0:
+            raise ValueError(f"progress rate must be positive: {progress_rate}")
+        self.progress: str = progress
+        self.progress_rate: float = progress_rate
+        self._last_report: float = -float("inf")
+        self._reported_best: float = float("inf")
+        # ring buffer with the full per-iteration trace, whatever the console shows
+        self.trace: deque = deque(maxlen=trace_size) if trace_size > 0 else None
+        self.grasp_candidates: int = grasp_candidates
+        self.exchange: Callable[[Solution], Solution] = exchange
+        self.exchange_interval: float = exchange_interval
+        self.seed: int = seed
 
         self.timer: Crono = Crono()
         self.current_temperature: float = None
@@ -123,6 +177,32 @@ class SimulatedAnnealing:
             if current_temperature is None
             else rounded(current_temperature, 4)
         )
+        best = self.best_solution._makespan if self.best_solution else None
+
+        # with the events sink on, the iteration is recorded there instead of as prose
+        events = self.logger.events_enabled
+        if events or self.trace is not None:
+            record = dict(
+                iteration=self.current_iteration,
+                temperature=temp_to_log,
+                current=float(current_obj),
+                makespan=float(new_obj),
+                best=float(best) if best is not None else None,
+                accepted=accepted,
+                prob=acceptance_prob if isinstance(acceptance_prob, float) else None,
+                rand=rand if isinstance(rand, float) else None,
+                time=time,
+                intensity_level=intensity_level,
+                no_improvement=no_improvement,
+            )
+            if self.trace is not None:
+                self.trace.append(record)
+            if events:
+                self.logger.event(**record)
+
+        report = self.old_logger.enabled and self._should_report(best)
+        if not report and (events or not self.logger.enabled):
+            return
 
         it_log = (
             f"T: {temp_to_log} | "
@@ -134,12 +214,39 @@ class SimulatedAnnealing:
             f"rand: {rounded(rand, 4)} | "
             f"accepted?: {accepted} | "
             f"time: {time} | "
-            f"best: {self.best_solution._makespan if self.best_solution else 'N/A'} | "
+            f"best: {best if best is not None else 'N/A'} | "
             f"h_stagnation: {no_improvement}"
         )
 
-        self.old_logger.log(it_log)
-        self.logger.log(it_log)
+        if report:
+            self.old_logger.log(it_log)
+        if not events:
+            self.logger.log(it_log)
+
+    def _should_report(self, best: float) -> bool:
+        """
+        Decides whether an iteration is shown on the console, according to the progress mode.
+
+        Args:
+            best: The best makespan found so far (None before the first solution).
+
+        Returns:
+            True if the iteration line should be written to the console logger.
+        """
+        if self.progress == "all":
+            return True
+
+        if self.progress == "best":
+            if best is None or best >= self._reported_best:
+                return False
+            self._reported_best = best
+            return True
+
+        now = self.timer.elapsed_time()
+        if now - self._last_report < 1.0 / self.progress_rate:
+            return False
+        self._last_report = now
+        return True
 
     def _calculate_initial_temperature(
         self, solution: Solution, max_iterations: int
@@ -175,8 +282,7 @@ class SimulatedAnnealing:
                 if delta <= 0:
                     accept_count += 1
                 else:
-                    rand = np.random.uniform(0, 1)
-                    if rand < exp(-delta / T):
+                    if metropolis_acceptance(-delta, T)[0]:
                         accept_count += 1
 
                 acceptance_rate = accept_count / (iteration + 1)
@@ -227,7 +333,7 @@ class SimulatedAnnealing:
         self.old_logger.level += 1
 
         logger = self.logger
-        builder = SolutionBuilder(logger=logger)
+        builder = SolutionBuilder(logger=logger, seed=self.seed)
 
         instance = solution._instance
         num_operations = len(instance.O)
@@ -259,6 +365,8 @@ class SimulatedAnnealing:
             logger.log(f"stagnation limit: {stagnation_limit} its")
 
             self.timer = Crono()
+            self._last_report = -float("inf")
+            self._reported_best = float("inf")
 
             self.best_solution = Solution(
                 instance=solution._instance,
@@ -278,6 +386,8 @@ class SimulatedAnnealing:
                 f"max its per temp: {max_iterations_per_temp}\n"
             )
 
+            next_exchange = self.exchange_interval
+
             while (
                 self.current_temperature > self.final_temperature
                 and self.timer.elapsed_time() < self.max_time
@@ -306,6 +416,22 @@ class SimulatedAnnealing:
                         iteration < max_iterations_per_temp
                         and self.timer.elapsed_time() < self.max_time
                     ):
+                        if (
+                            self.exchange is not None
+                            and self.timer.elapsed_time() >= next_exchange
+                        ):
+                            next_exchange += self.exchange_interval
+                            elite = self.exchange(self.best_solution)
+                            if elite is not None:
+                                current_solution.copy_solution(sol=elite)
+                                if elite._makespan < self.best_solution._makespan:
+                                    self.best_solution.copy_solution(sol=elite)
+                                self.intensity_level = 0
+                                self.no_improvement_counter = 0
+                                logger.log(
+                                    f"[*] restarting from the exchanged elite solution: {elite._makespan}"
+                                )
+
                         iteration += 1
                         self.current_iteration += 1
                         accepted: str = "-"
@@ -318,7 +444,7 @@ class SimulatedAnnealing:
                         )
 
                         is_neighbor_possible = True
-                        current_critical_path, current_more_criticals = (
+                        current_critical_path, current_more_criticals, _ = (
                             current_solution._find_a_critical_path()
                         )
                         if (
@@ -355,10 +481,10 @@ class SimulatedAnnealing:
                                 )
                                 # 'grasping' if local search fails
                                 builder.define_hiperparams(alpha_grasp=0.5)
-                                builder.build_solution(
+                                builder.build_best_solution(
                                     solution=current_solution,
-                                    machines_strategy="grasp",
-                                    scheduler_approach="machine_by_machine",
+                                    num_candidates=self.grasp_candidates,
+                                    scheduler_approach="event_driven",
                                 )
                                 current_solution.create_graph(
                                     tech_disjunc=True, graph_type="complete fjssp"
@@ -402,11 +528,12 @@ class SimulatedAnnealing:
                                 else:  # worsening solution
                                     accepted = "N"
                                     self.no_improvement_counter += 1
-                                    acceptance_prob = exp(
-                                        delta / self.current_temperature
+                                    is_accepted, acceptance_prob, rand = (
+                                        metropolis_acceptance(
+                                            delta, self.current_temperature
+                                        )
                                     )
-                                    rand = np.random.uniform(0, 1)
-                                    if rand < acceptance_prob:
+                                    if is_accepted:
                                         current_solution.copy_solution(sol=sol_prime)
                                         accepted = "Y"
                                         logger.log(
@@ -458,10 +585,10 @@ class SimulatedAnnealing:
                                     builder.define_hiperparams(
                                         alpha_grasp=0.5 + diversification_fact
                                     )
-                                    builder.build_solution(
+                                    builder.build_best_solution(
                                         solution=current_solution,
-                                        machines_strategy="grasp",
-                                        scheduler_approach="machine_by_machine",
+                                        num_candidates=self.grasp_candidates,
+                                        scheduler_approach="event_driven",
                                     )
                                     current_solution.create_graph(
                                         tech_disjunc=True, graph_type="complete fjssp"
@@ -495,10 +622,10 @@ class SimulatedAnnealing:
                                 builder.define_hiperparams(
                                     alpha_grasp=0.1 + diversification_fact
                                 )
-                                builder.build_solution(
+                                builder.build_best_solution(
                                     solution=current_solution,
-                                    machines_strategy="grasp",
-                                    scheduler_approach="machine_by_machine",
+                                    num_candidates=self.grasp_candidates,
+                                    scheduler_approach="event_driven",
                                 )
                                 current_solution.create_graph(
                                     tech_disjunc=True, graph_type="complete fjssp"
@@ -545,6 +672,9 @@ class SimulatedAnnealing:
             logger.log(f"best solution makespan: {self.best_solution._makespan}")
             logger.breakline()
 
+            logger.close()
+            self.old_logger.flush()
+
             return (
                 self.best_solution,
                 total_runtime,
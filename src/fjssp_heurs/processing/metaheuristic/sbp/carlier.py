@@ -1,10 +1,21 @@
-import copy
+import heapq
+
 from .schrage import SchrageScheduler
 from ....instance.instance import Instance
 from ....utils.logger import LOGGER
+from ....utils.crono import Crono
 
 
 class CarlierSolver:
+    SEARCH_MODES = ("depth_first", "best_first")
+
+    @staticmethod
+    def check_search(*, mode: str, max_nodes: int) -> None:
+        if mode not in CarlierSolver.SEARCH_MODES:
+            raise ValueError(f"unknown carlier search mode: '{mode}'")
+        if max_nodes is not None and max_nodes <= 0:
+            raise ValueError(f"carlier node budget must be positive: {max_nodes}")
+
     def __init__(
         self,
         operations: list[int],
@@ -14,27 +25,121 @@ class CarlierSolver:
         instance: Instance,
         logger: LOGGER,
         max_depth: int = 30,
+        mode: str = "depth_first",
+        max_nodes: int = None,
+        time_limit: float = None,
     ):
-        self._operations = operations
-        self._release_dates = release_dates
-        self._processing_times = processing_times
-        self._delivery_times = delivery_times
+        # the branching state lives in arrays indexed by the op's position in
+        # 'operations'; branches change it in place and an undo trail restores it
+        self._operations = list(operations)
+        self._release_dates = [release_dates[op] for op in self._operations]
+        self._processing_times = [processing_times[op] for op in self._operations]
+        self._delivery_times = [delivery_times[op] for op in self._operations]
         self._instance = instance
         self._logger = logger
         self.max_depth = max_depth
+        # 'best_first': iterative branch and bound pruned by preemptive lower bounds,
+        # limited by 'max_nodes' expansions and 'time_limit' seconds (None for no limit)
+        # 'depth_first': recursive search up to 'max_depth', without pruning
+        self.check_search(mode=mode, max_nodes=max_nodes)
+        self.mode = mode
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.nodes_expanded = 0
+
+        self._index_of = {op: i for i, op in enumerate(self._operations)}
+        self._job_successor, self._tech_successor = self._job_chains()
+        self._trail = []
 
         self.best_lmax = float("inf")
         self.best_schedule = []
 
+    def _job_chains(self) -> tuple[list[int], list[int]]:
+        # job_successor[i]: closest later op of the same job on this machine (-1 if none)
+        # tech_successor[i]: op right after i in its job, if it is also on this machine
+        instance = self._instance
+        index_of = self._index_of
+
+        ops_by_job = dict()
+        for i, op in enumerate(self._operations):
+            ops_by_job.setdefault(instance.job_of_op[op], []).append(i)
+
+        job_successor = [-1] * len(self._operations)
+        tech_successor = [-1] * len(self._operations)
+        for job, indexes in ops_by_job.items():
+            indexes.sort(key=lambda i: instance.pos_in_job[self._operations[i]])
+            for pred, succ in zip(indexes, indexes[1:]):
+                job_successor[pred] = succ
+
+            tech_seq = instance.S_j[job]
+            for i in indexes:
+                pos = instance.pos_in_job[self._operations[i]]
+                if pos + 1 < len(tech_seq):
+                    tech_successor[i] = index_of.get(tech_seq[pos + 1], -1)
+
+        return job_successor, tech_successor
+
+    def _set(self, values: list[float], i: int, value: float) -> None:
+        self._trail.append((values, i, values[i]))
+        values[i] = value
+
+    def _undo(self, mark: int) -> None:
+        trail = self._trail
+        while len(trail) > mark:
+            values, i, old_value = trail.pop()
+            values[i] = old_value
+
+    def _tighten_release_date(self, i: int) -> bool:
+        # an op can't be released before its technological predecessor on this machine
+        # is finished
+        release_dates = self._release_dates
+
+        succ = self._tech_successor[i]
+        if succ < 0:
+            return False
+
+        new_release = release_dates[i] + self._processing_times[i]
+        if new_release <= release_dates[succ]:
+            return False
+
+        if self._logger.enabled:
+            self._logger.log(
+                f"updating release date for op {self._operations[succ]}: {release_dates[succ]} -> {new_release} "
+                f"(due to precedence with {self._operations[i]})"
+            )
+        self._set(release_dates, succ, new_release)
+        return True
+
+    def _propagate_release_date(self, i: int) -> None:
+        # the rest of the chain was already tight, so it stops at the first unchanged op
+        while self._tighten_release_date(i):
+            i = self._tech_successor[i]
+
+    def _tighten_release_dates(self) -> None:
+        # one forward pass over the technological chains of the machine's ops
+        pos_in_job = self._instance.pos_in_job
+        operations = self._operations
+
+        for i in sorted(range(len(operations)), key=lambda i: pos_in_job[operations[i]]):
+            self._tighten_release_date(i)
+
     def _log_initial_state(self):
         logger = self._logger
+        if not logger.enabled:
+            return
+
+        operations = self._operations
 
         logger.log("---------- carlier algorithm initial state ----------")
 
         with logger:
-            logger.log(f"ops: {self._operations}")
-            logger.log(f"initial release dates: {self._release_dates}")
-            logger.log(f"initial delivery times: {self._delivery_times}")
+            logger.log(f"ops: {operations}")
+            logger.log(
+                f"initial release dates: {dict(zip(operations, self._release_dates))}"
+            )
+            logger.log(
+                f"initial delivery times: {dict(zip(operations, self._delivery_times))}"
+            )
             logger.log(f"max recursion depth: {self.max_depth}")
 
         logger.log("-" * 53 + "\n")
@@ -43,74 +148,85 @@ class CarlierSolver:
         self,
         makespan: float,
         sequence: list[int],
-        finish_times: dict[int, float],
-        start_times: dict[int, float],
+        finish_times: list[float],
+        start_times: list[float],
     ) -> list[int]:
         logger = self._logger
+        verbose = logger.enabled
+        operations = self._operations
 
-        logger.log(f"identifying critical path for makespan {makespan}")
+        if verbose:
+            logger.log(f"identifying critical path for makespan {makespan}")
 
         b_index = None
-        b_op = None
-        for op in reversed(sequence):
-            if finish_times[op] + self._delivery_times[op] == makespan:
-                b_op = op
-                b_index = sequence.index(b_op)
+        for index in range(len(sequence) - 1, -1, -1):
+            i = sequence[index]
+            if finish_times[i] + self._delivery_times[i] == makespan:
+                b_index = index
                 break
 
         if b_index is None:
             logger.log("no critical operation found!")
             return []
 
-        critical_path = [b_op]
-        logger.log(f"critical operation b: {critical_path[0]} at position {b_index}")
+        critical_path = [sequence[b_index]]
+        if verbose:
+            logger.log(
+                f"critical operation b: {operations[critical_path[0]]} at position {b_index}"
+            )
         if b_index == 0:
-            logger.log("b_index = 0, critical path with just one operation")
-            with logger:
-                logger.log(f"critical path: {critical_path}")
+            if verbose:
+                logger.log("b_index = 0, critical path with just one operation")
+                with logger:
+                    logger.log(f"critical path: {[operations[critical_path[0]]]}")
             return critical_path
 
-        logger.log("searching for preceding operations in sequence")
-        for op in reversed(sequence[: b_index + 1]):
-            if op != sequence[0]:
-                prec_op = sequence[sequence.index(op) - 1]
-            else:
-                break
+        if verbose:
+            logger.log("searching for preceding operations in sequence")
+        for index in range(b_index, 0, -1):
+            i, prec = sequence[index], sequence[index - 1]
 
-            logger.log(f"op: {op} | prec_op: {prec_op}")
-            if start_times[op] == finish_times[prec_op]:
-                critical_path.insert(0, prec_op)
-                logger.log(
-                    f"added {prec_op} to critical path (finish[{prec_op}] {finish_times[prec_op]} = start[{op}] {start_times[op]})"
-                )
+            if verbose:
+                logger.log(f"op: {operations[i]} | prec_op: {operations[prec]}")
+            if start_times[i] == finish_times[prec]:
+                critical_path.append(prec)
+                if verbose:
+                    logger.log(
+                        f"added {operations[prec]} to critical path (finish[{operations[prec]}] {finish_times[prec]} = start[{operations[i]}] {start_times[i]})"
+                    )
             else:
-                logger.log("critical path with just one operation")
+                if verbose:
+                    logger.log("critical path with just one operation")
                 break
 
-        logger.log(f"critical path: {critical_path}")
+        critical_path.reverse()
+        if verbose:
+            logger.log(f"critical path: {[operations[i] for i in critical_path]}")
         return critical_path
 
     def _check_optimality(self, makespan: float, critical_block: list[int]) -> bool:
         logger = self._logger
 
-        r_min = min(self._release_dates[o] for o in critical_block)
-        q_min = min(self._delivery_times[o] for o in critical_block)
-        p_sum = sum(self._processing_times[o] for o in critical_block)
+        r_min = min(self._release_dates[i] for i in critical_block)
+        q_min = min(self._delivery_times[i] for i in critical_block)
+        p_sum = sum(self._processing_times[i] for i in critical_block)
         lower_bound = r_min + p_sum + q_min
 
-        logger.log("optimality check")
-        with logger:
-            logger.log(f"r_min: {r_min}")
-            logger.log(f"p_sum: {p_sum}")
-            logger.log(f"q_min: {q_min}")
-            logger.log(f"LB: {lower_bound}")
-            logger.log(f"current makespan: {makespan}")
-
         is_optimal = lower_bound == makespan
-        if is_optimal:
-            logger.log("solution is optimal!")
-        else:
-            logger.log("solution not optimal - continuing search")
+
+        if logger.enabled:
+            logger.log("optimality check")
+            with logger:
+                logger.log(f"r_min: {r_min}")
+                logger.log(f"p_sum: {p_sum}")
+                logger.log(f"q_min: {q_min}")
+                logger.log(f"LB: {lower_bound}")
+                logger.log(f"current makespan: {makespan}")
+
+            if is_optimal:
+                logger.log("solution is optimal!")
+            else:
+                logger.log("solution not optimal - continuing search")
 
         return is_optimal
 
@@ -122,17 +238,194 @@ class CarlierSolver:
             return True
         return False
 
+    def _schrage(self) -> SchrageScheduler:
+        return SchrageScheduler(
+            self._operations,
+            self._release_dates,
+            self._processing_times,
+            self._delivery_times,
+            self._job_successor,
+            self._logger,
+        )
+
+    def _apply_changes(self, changes: tuple) -> None:
+        # rebuilds a node's state from the root one by replaying its branching changes
+        self._undo(self._root_mark)
+        for is_release, i, value in changes:
+            if is_release:
+                self._set(self._release_dates, i, value)
+                self._propagate_release_date(i)
+            else:
+                self._set(self._delivery_times, i, value)
+
+    def _evaluate(self, sequence: list[int]) -> float:
+        # lmax of a local sequence on the root data
+        release_dates = self._root_release_dates
+        processing_times = self._processing_times
+        delivery_times = self._root_delivery_times
+
+        t = 0.0
+        lmax = -float("inf")
+        for i in sequence:
+            t = max(t, release_dates[i]) + processing_times[i]
+            lmax = max(lmax, t + delivery_times[i])
+        return lmax
+
+    def _branching_block(
+        self, lmax: float, sequence: list[int], start_times, finish_times
+    ) -> tuple[int, list[int]]:
+        # returns the branching op k and its block J, or None when the node is a leaf
+        delivery_times = self._delivery_times
+
+        critical_path = self._get_critical_path(
+            lmax, sequence, finish_times, start_times
+        )
+        if not critical_path or self._check_optimality(lmax, critical_path):
+            return None
+
+        if self._has_intrajob_precedence(
+            instance=self._instance,
+            sequence=[self._operations[i] for i in sequence],
+        ):
+            return None
+
+        q_i2 = delivery_times[critical_path[-1]]
+        for index in range(len(critical_path) - 2, -1, -1):
+            if delivery_times[critical_path[index]] < q_i2:
+                return critical_path[index], critical_path[index + 1 :]
+
+        return None
+
+    def _solve_best_first(self) -> tuple[float, list[int]]:
+        logger = self._logger
+        verbose = logger.enabled
+        operations = self._operations
+        release_dates = self._release_dates
+        processing_times = self._processing_times
+        delivery_times = self._delivery_times
+
+        timer = Crono()
+        self._root_mark = len(self._trail)
+        self._root_release_dates = list(release_dates)
+        self._root_delivery_times = list(delivery_times)
+        self.nodes_expanded = 0
+
+        root_bound = self._schrage().preemptive_lmax()
+        if verbose:
+            logger.log(f"root preemptive lower bound: {root_bound}")
+
+        # (bound, node id, changes from the root)
+        queue = [(root_bound, 0, ())]
+        num_nodes = 1
+
+        while queue:
+            bound, _, changes = heapq.heappop(queue)
+
+            if bound >= self.best_lmax:
+                if verbose:
+                    logger.log(f"best open bound {bound} >= incumbent, search closed")
+                queue = []
+                break
+            if self.nodes_expanded > 0:
+                if self.max_nodes is not None and self.nodes_expanded >= self.max_nodes:
+                    if verbose:
+                        logger.log(f"node budget of {self.max_nodes} reached")
+                    break
+                if (
+                    self.time_limit is not None
+                    and timer.elapsed_time() >= self.time_limit
+                ):
+                    if verbose:
+                        logger.log(f"time budget of {self.time_limit}s reached")
+                    break
+
+            self._apply_changes(changes)
+            self.nodes_expanded += 1
+
+            if verbose:
+                logger.log(
+                    f"node {self.nodes_expanded} | depth: {len(changes)} | bound: {bound}"
+                )
+
+            with logger:
+                lmax, start_times, finish_times, sequence = self._schrage().schedule()
+
+                value = self._evaluate(sequence)
+                if value < self.best_lmax:
+                    self.best_lmax = value
+                    self.best_schedule = [operations[i] for i in sequence]
+                    if verbose:
+                        logger.log(
+                            f"found a better schedule | new lmax: {value} with sequence: {self.best_schedule}"
+                        )
+
+                branching = self._branching_block(
+                    lmax, sequence, start_times, finish_times
+                )
+                if branching is None:
+                    logger.log("node closed without branching")
+                    continue
+
+                k, J = branching
+                p_J = sum(processing_times[j] for j in J)
+                if verbose:
+                    logger.log(
+                        f"branching on operation {operations[k]} with block J = {[operations[j] for j in J]}"
+                    )
+
+                # k before J raises q[k], k after J raises r[k]
+                children = (
+                    (False, k, p_J + delivery_times[J[-1]]),
+                    (True, k, min(release_dates[j] for j in J) + p_J),
+                )
+                for is_release, i, value in children:
+                    values = release_dates if is_release else delivery_times
+                    if value <= values[i]:
+                        continue
+
+                    mark = len(self._trail)
+                    self._set(values, i, value)
+                    if is_release:
+                        self._propagate_release_date(i)
+                    child_bound = max(bound, self._schrage().preemptive_lmax())
+                    self._undo(mark)
+
+                    if child_bound < self.best_lmax:
+                        child_changes = changes + ((is_release, i, value),)
+                        heapq.heappush(queue, (child_bound, num_nodes, child_changes))
+                        num_nodes += 1
+                    elif verbose:
+                        logger.log(f"child pruned by its bound {child_bound}")
+
+        self._undo(self._root_mark)
+
+        if queue:
+            if verbose:
+                logger.log(
+                    f"search stopped with {len(queue)} open nodes | best open bound: {queue[0][0]}"
+                )
+
+        return self.best_lmax, self.best_schedule
+
     def solve(self) -> tuple[float, list[int]]:
         self._log_initial_state()
         self.best_lmax = float("inf")
         self.best_schedule = []
 
         logger = self._logger
+        operations = self._operations
+        release_dates = self._release_dates
+        processing_times = self._processing_times
+        delivery_times = self._delivery_times
+
+        self._trail = []
+        self._tighten_release_dates()
 
         logger.breakline()
 
         def _branch(depth: int = 0) -> tuple[float, list[int]]:
-            logger.log(f"{':' * 8} branching at depth {depth} {':' * 8}")
+            if logger.enabled:
+                logger.log(f"{':' * 8} branching at depth {depth} {':' * 8}")
 
             with logger:
                 if depth > self.max_depth:
@@ -143,14 +436,17 @@ class CarlierSolver:
 
                 with logger:
                     schrage = SchrageScheduler(
-                        self._operations,
-                        self._release_dates,
-                        self._processing_times,
-                        self._delivery_times,
-                        self._instance,
+                        operations,
+                        release_dates,
+                        processing_times,
+                        delivery_times,
+                        self._job_successor,
                         logger,
                     )
-                    lmax, start_times, finish_times, sequence = schrage.schedule()
+                    lmax, start_times, finish_times, local_sequence = (
+                        schrage.schedule()
+                    )
+                    sequence = [operations[i] for i in local_sequence]
                 logger.breakline()
 
                 logger.log("[2] verify if a worst schedule was found")
@@ -158,10 +454,11 @@ class CarlierSolver:
                     if lmax < self.best_lmax:
                         self.best_lmax = lmax
                         self.best_schedule = sequence.copy()
-                        logger.log(
-                            f"found a better schedule | new lmax: {lmax} with sequence: {sequence}"
-                        )
-                    else:
+                        if logger.enabled:
+                            logger.log(
+                                f"found a better schedule | new lmax: {lmax} with sequence: {sequence}"
+                            )
+                    elif logger.enabled:
                         logger.log(
                             f"no best schedule found | staying with lmax: {self.best_lmax} with sequence: {self.best_schedule}"
                         )
@@ -170,7 +467,7 @@ class CarlierSolver:
                 logger.log("[3] find critical path/block")
                 with logger:
                     critical_path = self._get_critical_path(
-                        lmax, sequence, finish_times, start_times
+                        lmax, local_sequence, finish_times, start_times
                     )
                 logger.breakline()
 
@@ -193,37 +490,43 @@ class CarlierSolver:
 
                     logger.log("[6] identifying branching operation k")
                     with logger:
-                        logger.log(f"critical path: {critical_path}")
-                        logger.log(
-                            f"q_j: {[self._delivery_times[op] for op in critical_path]}"
-                        )
+                        if logger.enabled:
+                            logger.log(
+                                f"critical path: {[operations[i] for i in critical_path]}"
+                            )
+                            logger.log(
+                                f"q_j: {[delivery_times[i] for i in critical_path]}"
+                            )
                         i2 = critical_path[-1]
-                        q_i2 = self._delivery_times[i2]
-                        k = None
+                        q_i2 = delivery_times[i2]
+                        index_k = None
 
-                        for op in reversed(critical_path[:-1]):
-                            if self._delivery_times[op] < q_i2:
-                                k = op
+                        for index in range(len(critical_path) - 2, -1, -1):
+                            if delivery_times[critical_path[index]] < q_i2:
+                                index_k = index
                                 break
 
-                        if k is None:
+                        if index_k is None:
                             logger.log(
                                 "no suitable k found for branching - terminating branch"
                             )
                             return lmax, sequence
                         else:
-                            logger.log(f"branching operation found: {k}")
+                            k = critical_path[index_k]
+                            if logger.enabled:
+                                logger.log(
+                                    f"branching operation found: {operations[k]}"
+                                )
                     logger.breakline()
 
                     logger.log("[7] branching")
-                    index_k = critical_path.index(k)
-                    index_i2 = critical_path.index(i2)
-                    J = critical_path[index_k + 1 : index_i2 + 1]
+                    J = critical_path[index_k + 1 :]
                     logger.breakline()
 
-                    logger.log(
-                        f"[8] branching on operation {k} (q = {self._delivery_times[k]}) with block J = {J}"
-                    )
+                    if logger.enabled:
+                        logger.log(
+                            f"[8] branching on operation {operations[k]} (q = {delivery_times[k]}) with block J = {[operations[j] for j in J]}"
+                        )
                     logger.breakline()
 
                     with logger:
@@ -232,25 +535,23 @@ class CarlierSolver:
                         )
 
                         with logger:
-                            new_q = copy.deepcopy(self._delivery_times)
-                            q_p = self._delivery_times[J[-1]]
-                            new_q[k] = max(
-                                self._delivery_times[k],
-                                sum(self._processing_times[j] for j in J) + q_p,
-                            )
-
-                            if new_q[k] > self._delivery_times[k]:
-                                logger.log(
-                                    f"branch 1: increasing q[{k}] from {self._delivery_times[k]} to {new_q[k]}"
-                                )
-                                old_q = self._delivery_times
-                                self._delivery_times = new_q
+                            p_J = sum(processing_times[j] for j in J)
+                            new_q = max(delivery_times[k], p_J + delivery_times[J[-1]])
+
+                            if new_q > delivery_times[k]:
+                                if logger.enabled:
+                                    logger.log(
+                                        f"branch 1: increasing q[{operations[k]}] from {delivery_times[k]} to {new_q}"
+                                    )
+                                mark = len(self._trail)
+                                self._set(delivery_times, k, new_q)
                                 f1, _ = _branch(depth + 1)
-                                self._delivery_times = old_q
+                                self._undo(mark)
                             else:
-                                logger.log(
-                                    f"branch 1 skipped: q[{k}] would not increase"
-                                )
+                                if logger.enabled:
+                                    logger.log(
+                                        f"branch 1 skipped: q[{operations[k]}] would not increase"
+                                    )
                                 f1 = float("inf")
 
                         logger.log(
@@ -258,25 +559,26 @@ class CarlierSolver:
                         )
 
                         with logger:
-                            new_r = copy.deepcopy(self._release_dates)
-                            new_r[k] = max(
-                                new_r[k],
-                                min(self._release_dates[j] for j in J)
-                                + sum(self._processing_times[j] for j in J),
+                            new_r = max(
+                                release_dates[k],
+                                min(release_dates[j] for j in J) + p_J,
                             )
 
-                            if new_r[k] > self._release_dates[k]:
-                                logger.log(
-                                    f"branch 2: increasing r[{k}] from {self._release_dates[k]} to {new_r[k]}"
-                                )
-                                old_r = self._release_dates
-                                self._release_dates = new_r
+                            if new_r > release_dates[k]:
+                                if logger.enabled:
+                                    logger.log(
+                                        f"branch 2: increasing r[{operations[k]}] from {release_dates[k]} to {new_r}"
+                                    )
+                                mark = len(self._trail)
+                                self._set(release_dates, k, new_r)
+                                self._propagate_release_date(k)
                                 f2, _ = _branch(depth + 1)
-                                self._release_dates = old_r
+                                self._undo(mark)
                             else:
-                                logger.log(
-                                    f"branch 2 skipped: r[{k}] would not increase"
-                                )
+                                if logger.enabled:
+                                    logger.log(
+                                        f"branch 2 skipped: r[{operations[k]}] would not increase"
+                                    )
                                 f2 = float("inf")
                     return min(f1, f2), sequence
                 else:
@@ -286,14 +588,21 @@ class CarlierSolver:
                         )
                     return lmax, sequence
 
-        final_lmax, final_sequence = _branch()
+        if self.mode == "best_first":
+            final_lmax, final_sequence = self._solve_best_first()
+        else:
+            final_lmax, final_sequence = _branch()
+        self._undo(0)
 
         logger.breakline()
 
         logger.log("------ carlier algorithm finished ------")
         with logger:
-            logger.log(f"greater lmax: {final_lmax}")
-            logger.log(f"best sequence: {final_sequence}")
+            if logger.enabled:
+                if self.mode == "best_first":
+                    logger.log(f"nodes expanded: {self.nodes_expanded}")
+                logger.log(f"greater lmax: {final_lmax}")
+                logger.log(f"best sequence: {final_sequence}")
         logger.log("-" * 40)
 
         return final_lmax, final_sequence
@@ -1,12 +1,248 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import os
+
 from ..solution import Solution
 from ....instance.instance import Instance
 from .carlier import CarlierSolver
+from .schrage import SchrageScheduler
 from ....utils.logger import LOGGER
 
 
+# state of a bottleneck worker process, set once by its initializer
+_worker_instance: Instance = None
+_worker_logger: LOGGER = None
+_worker_carlier_params: dict = None
+
+
+def _init_worker(instance: Instance, carlier_params: dict) -> None:
+    global _worker_instance, _worker_logger, _worker_carlier_params
+    _worker_instance = instance
+    _worker_logger = LOGGER(log_path=os.devnull, out="off")
+    _worker_carlier_params = carlier_params
+
+
+def _solve_in_worker(
+    operations: list[int],
+    release_dates: dict[int, float],
+    processing_times: dict[int, float],
+    delivery_times: dict[int, float],
+) -> tuple[float, list[int]]:
+    return CarlierSolver(
+        operations=operations,
+        release_dates=release_dates,
+        processing_times=processing_times,
+        delivery_times=delivery_times,
+        instance=_worker_instance,
+        logger=_worker_logger,
+        **_worker_carlier_params,
+    ).solve()
+
+
 class ShiftingBottleneck:
-    def __init__(self, *, log_out: str = "both"):
-        self._logger = LOGGER(log_path="sbplog.log", out=log_out)
+    def __init__(
+        self,
+        *,
+        log_out: str = "both",
+        cache_size: int = 4096,
+        workers: int = 1,
+        screening_k: int = None,
+        carlier_mode: str = "depth_first",
+        carlier_max_nodes: int = None,
+    ):
+        CarlierSolver.check_search(mode=carlier_mode, max_nodes=carlier_max_nodes)
+        self._logger = LOGGER(log_path="sbplog.log", out=log_out, buffer_lines=256)
+
+        # search of every carlier solver. the best-first mode is only exact without a
+        # node budget
+        self._carlier_params = {"mode": carlier_mode, "max_nodes": carlier_max_nodes}
+
+        # with screening_k set, a bottleneck search only runs carlier on the k machines
+        # with the largest preemptive (jackson) lower bounds
+        self._screening_k = screening_k
+        self.screening_searches = 0
+        self.screening_candidates = 0
+        self.screening_solved = 0
+
+        # with workers > 1, the carliers of a bottleneck search run in a process pool
+        self._workers = workers
+        self._pool = None
+        self._pool_instance = None
+
+        # lru cache of solved single-machine subproblems, keyed by their fingerprint
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_instance = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def cache_info(self) -> dict[str, int]:
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self._cache),
+            "max_size": self._cache_size,
+        }
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def screening_info(self) -> dict[str, int]:
+        return {
+            "k": self._screening_k,
+            "searches": self.screening_searches,
+            "candidates": self.screening_candidates,
+            "solved": self.screening_solved,
+            "skipped": self.screening_candidates - self.screening_solved,
+        }
+
+    def _screen_machines(
+        self,
+        *,
+        solution: Solution,
+        machines: list[int],
+        release_dates: dict[int, float],
+        delivery_times: dict[int, float],
+    ) -> list[int]:
+        logger = self._logger
+        instance = solution._instance
+
+        lower_bounds = dict()
+        for machine in machines:
+            operations = solution.machine_sequence(machine)
+            if not operations:
+                continue
+
+            lower_bounds[machine] = SchrageScheduler(
+                operations,
+                [release_dates[op] for op in operations],
+                [instance.p[(op, machine)] for op in operations],
+                [delivery_times[op] for op in operations],
+                [-1] * len(operations),
+                logger,
+            ).preemptive_lmax()
+
+        ranking = sorted(lower_bounds, key=lambda m: (-lower_bounds[m], m))
+        kept = sorted(ranking[: self._screening_k])
+
+        self.screening_searches += 1
+        self.screening_candidates += len(ranking)
+        self.screening_solved += len(kept)
+
+        if logger.enabled:
+            logger.log(
+                f"screening by preemptive lower bound | bounds: {lower_bounds} | kept: {kept}"
+            )
+
+        return kept
+
+    def close(self) -> None:
+        # releases the worker pool and the sbp log file, once the solver isn't needed
+        self._close_pool()
+        self._logger.close()
+
+    def _close_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+            self._pool_instance = None
+
+    def _get_pool(self, instance: Instance) -> ProcessPoolExecutor:
+        if self._pool is None or self._pool_instance is not instance:
+            self._close_pool()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self._workers,
+                initializer=_init_worker,
+                initargs=(instance, self._carlier_params),
+            )
+            self._pool_instance = instance
+        return self._pool
+
+    def _subproblem_key(
+        self,
+        *,
+        operations: list[int],
+        release_dates: dict[int, float],
+        processing_times: dict[int, float],
+        delivery_times: dict[int, float],
+        instance: Instance,
+    ) -> tuple:
+        if instance is not self._cache_instance:
+            self._cache.clear()
+            self._cache_instance = instance
+
+        # the subproblem only depends on the ops and their (r, p, q), not on their order
+        return tuple(
+            sorted(
+                (op, release_dates[op], processing_times[op], delivery_times[op])
+                for op in operations
+            )
+        )
+
+    def _cache_store(self, key: tuple, lmax: float, sequence: list[int]) -> None:
+        if self._cache_size > 0:
+            self._cache[key] = (lmax, tuple(sequence))
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def _solve_machines_in_parallel(
+        self,
+        *,
+        solution: Solution,
+        machines: list[int],
+        release_dates: dict[int, float],
+        delivery_times: dict[int, float],
+    ) -> dict[int, tuple[float, list[int]]]:
+        logger = self._logger
+        instance = solution._instance
+
+        pending = dict()
+        for machine in machines:
+            operations = solution.machine_sequence(machine)
+            if len(operations) <= 1:
+                continue
+
+            processing_times = {op: instance.p[(op, machine)] for op in operations}
+            key = self._subproblem_key(
+                operations=operations,
+                release_dates=release_dates,
+                processing_times=processing_times,
+                delivery_times=delivery_times,
+                instance=instance,
+            )
+            if key not in self._cache:
+                pending[machine] = (key, operations, processing_times)
+
+        if len(pending) < 2:
+            return dict()
+
+        if logger.enabled:
+            logger.log(
+                f"solving {len(pending)} single-machine subproblems in {self._workers} workers"
+            )
+
+        pool = self._get_pool(instance)
+        futures = {
+            machine: pool.submit(
+                _solve_in_worker,
+                operations,
+                {op: release_dates[op] for op in operations},
+                processing_times,
+                {op: delivery_times[op] for op in operations},
+            )
+            for machine, (_, operations, processing_times) in pending.items()
+        }
+
+        solved = dict()
+        for machine, future in futures.items():
+            lmax, sequence = future.result()
+            self.cache_misses += 1
+            self._cache_store(pending[machine][0], lmax, sequence)
+            solved[machine] = (lmax, sequence)
+
+        return solved
 
     def process(self, *, solution: Solution, old_logger: LOGGER) -> None:
         with old_logger:
@@ -17,24 +253,27 @@ class ShiftingBottleneck:
 
         logger = self._logger
         instance = solution._instance
+        graph = solution._owned_graph()
 
         logger.log("starting sbp processing")
 
         remaining_machines = set(
-            [m for m in instance.M if len(solution._machine_sequence[m]) > 0]
+            [m for m in instance.M if len(solution.machine_sequence(m)) > 0]
         )
         sequenced_machines = set()
 
-        logger.log(f"starting remaining machines to schedule: {remaining_machines}")
+        if logger.enabled:
+            logger.log(f"starting remaining machines to schedule: {remaining_machines}")
         logger.breakline()
 
         logger.log("sbp algorithm:")
 
         with logger:
             while len(remaining_machines) > 0:
-                logger.log(
-                    f"|M'| = {len(remaining_machines)} : there are machines remaining to schedule - continue"
-                )
+                if logger.enabled:
+                    logger.log(
+                        f"|M'| = {len(remaining_machines)} : there are machines remaining to schedule - continue"
+                    )
 
                 with logger:
                     logger.log("calling the bottleneck machine finder")
@@ -42,15 +281,19 @@ class ShiftingBottleneck:
                         solution=solution, machines_subset=remaining_machines
                     )
 
-                    logger.log(
-                        f"the bottleneck machine is: {bottleneck_machine} | its sequence is: {machine_seq}"
-                    )
+                    if logger.enabled:
+                        logger.log(
+                            f"the bottleneck machine is: {bottleneck_machine} | its sequence is: {machine_seq}"
+                        )
 
-                    solution._graph.consolidate_sequence_on_machine(
+                    graph.consolidate_sequence_on_machine(
                         machine_id=bottleneck_machine, sequence=machine_seq
                     )
-                    solution._machine_sequence[bottleneck_machine] = machine_seq
-                    logger.log(f"bottleneck machine {bottleneck_machine} scheduled!")
+                    solution.set_machine_sequence(bottleneck_machine, machine_seq)
+                    if logger.enabled:
+                        logger.log(
+                            f"bottleneck machine {bottleneck_machine} scheduled!"
+                        )
 
                     remaining_machines.remove(bottleneck_machine)
                     sequenced_machines.add(bottleneck_machine)
@@ -58,7 +301,8 @@ class ShiftingBottleneck:
                     logger.log("recalculating times")
                     new_makespan = solution._recalculate_times(logger=logger)
 
-                    logger.log(f"updated makespan: {new_makespan}")
+                    if logger.enabled:
+                        logger.log(f"updated makespan: {new_makespan}")
                     logger.breakline()
 
                     if len(sequenced_machines) > 1:
@@ -70,19 +314,19 @@ class ShiftingBottleneck:
                                 if machine == bottleneck_machine:
                                     continue
 
-                                logger.log(f"reoptimizing machine {machine}")
+                                if logger.enabled:
+                                    logger.log(f"reoptimizing machine {machine}")
 
-                                operations = solution._machine_sequence[machine]
+                                operations = solution.machine_sequence(machine)
                                 processing_times = {
                                     op: instance.p[(op, machine)] for op in operations
                                 }
+                                heads, tails = graph.heads_and_tails()
                                 release_dates = {
-                                    op: solution._graph.longest_path_to(op=op)
-                                    for op in operations
+                                    op: float(heads[op]) for op in operations
                                 }
                                 delivery_times = {
-                                    op: solution._graph.longest_path_from(op=op)
-                                    for op in operations
+                                    op: float(tails[op]) for op in operations
                                 }
 
                                 _, new_sequence = self.solve_single_machine(
@@ -93,23 +337,34 @@ class ShiftingBottleneck:
                                     instance=instance,
                                 )
 
-                                logger.log(f"updating sequence for machine {machine}")
-                                solution._graph.remove_sequence_on_machine(
+                                if logger.enabled:
+                                    logger.log(
+                                        f"updating sequence for machine {machine}"
+                                    )
+                                graph.remove_sequence_on_machine(
                                     machine_id=machine
                                 )
-                                solution._graph.consolidate_sequence_on_machine(
+                                graph.consolidate_sequence_on_machine(
                                     machine_id=machine, sequence=new_sequence
                                 )
-                                solution._machine_sequence[machine] = new_sequence
+                                solution.set_machine_sequence(machine, new_sequence)
                                 logger.log("recalculating times")
                                 solution._recalculate_times(logger=logger)
-                                logger.log(f"new makespan: {solution._makespan}")
+                                if logger.enabled:
+                                    logger.log(f"new makespan: {solution._makespan}")
                     else:
                         logger.log(
                             "only 1 machine scheduled, there's no reoptimization now"
                         )
                     logger.breakline()
 
+        if logger.enabled:
+            logger.log(f"single-machine cache: {self.cache_info()}")
+            if self._screening_k is not None:
+                logger.log(f"bottleneck screening: {self.screening_info()}")
+
+        logger.flush()
+
     def bottleneck_machine(
         self,
         *,
@@ -121,9 +376,10 @@ class ShiftingBottleneck:
         instance = solution._instance
 
         with logger:
-            logger.log(
-                f"bottleneck machine finder algorithm | elegible machines: {machines_subset} :"
-            )
+            if logger.enabled:
+                logger.log(
+                    f"bottleneck machine finder algorithm | elegible machines: {machines_subset} :"
+                )
 
             bottleneck_machine = None
             worst_machine_lateness = -float("inf")
@@ -133,42 +389,62 @@ class ShiftingBottleneck:
                 "for each elegible bottleneck machine, will run a carlier to define its minimum maximum machine lateness"
             )
 
-            release_dates = {
-                op: solution._graph.longest_path_to(op=op) for op in instance.O
-            }
-            delivery_times = {
-                op: solution._graph.longest_path_from(op=op) for op in instance.O
-            }
+            heads, tails = solution._graph.heads_and_tails()
+            release_dates = {op: float(heads[op]) for op in instance.O}
+            delivery_times = {op: float(tails[op]) for op in instance.O}
+
+            # machines are visited by id and only a strictly larger lateness replaces the
+            # bottleneck, so ties go to the smallest machine id in both execution modes
+            machines = sorted(machines_subset)
+            if self._screening_k is not None and len(machines) > self._screening_k:
+                machines = self._screen_machines(
+                    solution=solution,
+                    machines=machines,
+                    release_dates=release_dates,
+                    delivery_times=delivery_times,
+                )
+
+            solved = dict()
+            if self._workers > 1:
+                solved = self._solve_machines_in_parallel(
+                    solution=solution,
+                    machines=machines,
+                    release_dates=release_dates,
+                    delivery_times=delivery_times,
+                )
 
             with logger:
-                for machine in machines_subset:
-                    if not solution._machine_sequence[machine]:
+                for machine in machines:
+                    operations = solution.machine_sequence(machine)
+                    if not operations:
                         continue
 
-                    logger.log(f"machine {machine}")
+                    if logger.enabled:
+                        logger.log(f"machine {machine}")
 
                     with logger:
-                        logger.log(
-                            f"time to solve single-machine (by carlier) for machine {machine} | ops assigned: {solution._machine_sequence[machine]}"
-                        )
-
-                        operations = solution._machine_sequence[machine]
                         processing_times = {
                             op: instance.p[(op, machine)] for op in operations
                         }
 
-                        logger.log("ops in machine summary:")
+                        if logger.enabled:
+                            logger.log(
+                                f"time to solve single-machine (by carlier) for machine {machine} | ops assigned: {operations}"
+                            )
 
-                        with logger:
-                            for op in operations:
-                                logger.log(
-                                    f"op: {op} | release: {release_dates[op]} | processing: {processing_times[op]} | delivery: {delivery_times[op]}"
-                                )
+                            logger.log("ops in machine summary:")
+
+                            with logger:
+                                for op in operations:
+                                    logger.log(
+                                        f"op: {op} | release: {release_dates[op]} | processing: {processing_times[op]} | delivery: {delivery_times[op]}"
+                                    )
 
                         if len(operations) <= 1:
-                            logger.log(
-                                f"current machine {machine} has only 1 op assigned, there's no carlier's optimization"
-                            )
+                            if logger.enabled:
+                                logger.log(
+                                    f"current machine {machine} has only 1 op assigned, there's no carlier's optimization"
+                                )
                             op = operations[0]
                             machine_lateness = (
                                 release_dates[op]
@@ -176,6 +452,9 @@ class ShiftingBottleneck:
                                 + delivery_times[op]
                             )
                             machine_sequence = operations
+                        elif machine in solved:
+                            logger.log("single-machine subproblem solved by a worker")
+                            machine_lateness, machine_sequence = solved[machine]
                         else:
                             logger.log("calling carlier single machine solver")
                             machine_lateness, machine_sequence = (
@@ -193,24 +472,27 @@ class ShiftingBottleneck:
                                 "found a 'worse' machine than the current bottleneck"
                             )
                             with logger:
-                                logger.log(
-                                    f"old bottleneck (m: {bottleneck_machine}, lateness: {worst_machine_lateness})"
-                                )
+                                if logger.enabled:
+                                    logger.log(
+                                        f"old bottleneck (m: {bottleneck_machine}, lateness: {worst_machine_lateness})"
+                                    )
 
                                 bottleneck_machine = machine
                                 worst_machine_lateness = machine_lateness
                                 worst_machine_sequence = machine_sequence
 
-                                logger.log(
-                                    f"new bottleneck (m: {bottleneck_machine}, lateness: {worst_machine_lateness})"
-                                )
+                                if logger.enabled:
+                                    logger.log(
+                                        f"new bottleneck (m: {bottleneck_machine}, lateness: {worst_machine_lateness})"
+                                    )
                         else:
                             logger.log(
                                 "no 'worse' machine than the current bottleneck found"
                             )
-                            logger.log(
-                                f"using the same current bottleneck: {bottleneck_machine}, lateness: {worst_machine_lateness}"
-                            )
+                            if logger.enabled:
+                                logger.log(
+                                    f"using the same current bottleneck: {bottleneck_machine}, lateness: {worst_machine_lateness}"
+                                )
 
         return bottleneck_machine, worst_machine_sequence
 
@@ -225,6 +507,27 @@ class ShiftingBottleneck:
     ) -> tuple:
         logger = self._logger
 
+        key = self._subproblem_key(
+            operations=operations,
+            release_dates=release_dates,
+            processing_times=processing_times,
+            delivery_times=delivery_times,
+            instance=instance,
+        )
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            lmax, sequence = cached
+            if logger.enabled:
+                with logger:
+                    logger.log(
+                        f"single-machine subproblem found in cache | lmax: {lmax} | machine_sequence: {sequence}"
+                    )
+            return lmax, list(sequence)
+
+        self.cache_misses += 1
+
         with logger:
             logger.log("creating a carlier for a single machine scheduling problem")
 
@@ -235,12 +538,17 @@ class ShiftingBottleneck:
                 delivery_times=delivery_times,
                 instance=instance,
                 logger=self._logger,
+                **self._carlier_params,
             )
 
             logger.log("starting carlier algorithm")
             with logger:
                 lmax, sequence = carlier_problem.solve()
-            logger.log(
-                f"finished carlier algorithm | lmax: {lmax} | machine_sequence: {sequence}"
-            )
+            if logger.enabled:
+                logger.log(
+                    f"finished carlier algorithm | lmax: {lmax} | machine_sequence: {sequence}"
+                )
+
+        self._cache_store(key, lmax, sequence)
+
         return lmax, sequence
@@ -1,147 +1,199 @@
-from ....instance.instance import Instance
+import heapq
+
 from ....utils.logger import LOGGER
 
 
 class SchrageScheduler:
+    # works on a single-machine state indexed by local position: 'operations[i]' is the
+    # op id of index i and r/p/q are sequences indexed by i. 'job_successor[i]' is the
+    # index of the closest op of the same job that comes later on the machine (-1 if
+    # none). the state is only read, so callers may share their arrays
     def __init__(
         self,
         operations: list[int],
-        release_dates: dict[int, float],
-        processing_times: dict[int, float],
-        delivery_times: dict[int, float],
-        instance: Instance,
+        release_dates: list[float],
+        processing_times: list[float],
+        delivery_times: list[float],
+        job_successor: list[int],
         logger: LOGGER,
     ):
         self._operations = operations
         self._release_dates = release_dates
         self._processing_times = processing_times
         self._delivery_times = delivery_times
-        self._instance = instance
+        self._job_successor = job_successor
         self._logger = logger
 
     def _log_initial_parameters(self):
         logger = self._logger
+        if not logger.enabled:
+            return
+
+        operations = self._operations
 
         logger.log("---------- schrage algorithm parameters ----------")
 
         with logger:
-            logger.log(f"ops: {self._operations}")
-            logger.log(f"release dates: {self._release_dates}")
-            logger.log(f"processing times: {self._processing_times}")
-            logger.log(f"delivery times: {self._delivery_times}")
+            logger.log(f"ops: {operations}")
+            logger.log(f"release dates: {dict(zip(operations, self._release_dates))}")
+            logger.log(
+                f"processing times: {dict(zip(operations, self._processing_times))}"
+            )
+            logger.log(
+                f"delivery times: {dict(zip(operations, self._delivery_times))}"
+            )
 
         logger.log("-" * 50)
 
         logger.breakline()
 
-    def _update_release_dates_based_on_precedence(self):
-        logger = self._logger
-
-        for job, tech_seq in self._instance.S_j.items():
-            for i in range(1, len(tech_seq)):
-                pred = tech_seq[i - 1]
-                curr = tech_seq[i]
-                if pred in self._operations and curr in self._operations:
-                    new_release = max(
-                        self._release_dates[curr],
-                        self._release_dates[pred] + self._processing_times[pred],
-                    )
-                    if new_release != self._release_dates[curr]:
-                        logger.log(
-                            f"updating release date for op {curr}: {self._release_dates[curr]} -> {new_release} "
-                            f"(due to precedence with {pred})"
-                        )
-                        self._release_dates[curr] = new_release
-
-    def schedule(self) -> tuple[float, dict[int, float], dict[int, float], list[int]]:
+    def schedule(self) -> tuple[float, list[float], list[float], list[int]]:
         self._log_initial_parameters()
-        self._update_release_dates_based_on_precedence()
 
         logger = self._logger
-
-        t = min(self._release_dates[op] for op in self._operations)
+        verbose = logger.enabled
+
+        operations = self._operations
+        release_dates = self._release_dates
+        processing_times = self._processing_times
+        delivery_times = self._delivery_times
+        job_successor = self._job_successor
+
+        num_ops = len(operations)
+        has_job_pred = [False] * num_ops
+        for succ in job_successor:
+            if succ >= 0:
+                has_job_pred[succ] = True
+
+        # not yet released ops whose job predecessors are already scheduled: (r, i)
+        released = [
+            (release_dates[i], i) for i in range(num_ops) if not has_job_pred[i]
+        ]
+        heapq.heapify(released)
+        # ready ops by largest delivery time, ties by smallest op id: (-q, op, i)
+        ready = []
+
+        t = min(release_dates)
         lmax = 0
-        remaining_ops = set(self._operations)
-        ready_ops = set()
-        start_times = {}
-        finish_times = {}
+        start_times = [None] * num_ops
+        finish_times = [None] * num_ops
         sequence = []
 
-        logger.log(f"starting schrage scheduling at t = {t}")
+        if verbose:
+            logger.log(f"starting schrage scheduling at t = {t}")
 
-        while remaining_ops or ready_ops:
-            logger.breakline()
-            logger.log(
-                f"there are remaining ops to schedule | remaining: {remaining_ops}"
-            )
+        while released or ready:
+            if verbose:
+                logger.breakline()
+                logger.log(
+                    f"there are remaining ops to schedule | remaining: {num_ops - len(sequence)}"
+                )
 
-            logger.log(f"current time: {t}")
-            logger.log(f"remaining ops: {remaining_ops}")
-            logger.log(f"ready ops: {ready_ops}")
+                logger.log(f"current time: {t}")
 
-            logger.breakline()
-            logger.log("checking which ops can become ready:")
+                logger.breakline()
+                logger.log("checking which ops can become ready:")
 
             with logger:
-                for op in list(remaining_ops):
-                    if self._release_dates[op] <= t:
-                        job = self._instance.job_of_op[op]
-                        tech_seq = self._instance.S_j[job]
-                        job_ops = [o for o in self._operations if o in tech_seq]
-                        pred_ops = [
-                            o for o in job_ops if tech_seq.index(o) < tech_seq.index(op)
-                        ]
-
-                        if all(pred_op in sequence for pred_op in pred_ops):
-                            ready_ops.add(op)
-                            remaining_ops.remove(op)
-                            logger.log(
-                                f"op {op} is now ready (release date: {self._release_dates[op]})"
-                            )
-                        else:
-                            logger.log(
-                                f"op {op} can't be ready yet - missing predecessors: "
-                                f"{set(pred_ops) - set(sequence)}"
-                            )
-
-            if ready_ops:
-                logger.log(f"exists ready ops in time t = {t}")
-
-                op = max(ready_ops, key=lambda o: self._delivery_times[o])
-                ready_ops.remove(op)
-
-                start_times[op] = t
-                processing_time = self._processing_times[op]
-                finish_times[op] = t + processing_time
-                sequence.append(op)
+                while released and released[0][0] <= t:
+                    release, i = heapq.heappop(released)
+                    heapq.heappush(ready, (-delivery_times[i], operations[i], i))
+                    if verbose:
+                        logger.log(
+                            f"op {operations[i]} is now ready (release date: {release})"
+                        )
 
-                logger.log(
-                    f"scheduled op {op} at t = {t} -> {t + processing_time} "
-                    f"(q = {self._delivery_times[op]})"
-                )
+            if ready:
+                _, op, i = heapq.heappop(ready)
+
+                start_times[i] = t
+                processing_time = processing_times[i]
+                finish_times[i] = t + processing_time
+                sequence.append(i)
+
+                if verbose:
+                    logger.log(f"exists ready ops in time t = {t}")
+                    logger.log(
+                        f"scheduled op {op} at t = {t} -> {t + processing_time} "
+                        f"(q = {delivery_times[i]})"
+                    )
 
                 t += processing_time
-                if lmax > t + self._delivery_times[op]:
-                    lmax = lmax
-                    logger.log(f"staying with best lmax: {lmax}")
+                if lmax > t + delivery_times[i]:
+                    if verbose:
+                        logger.log(f"staying with best lmax: {lmax}")
                 else:
-                    lmax = t + self._delivery_times[op]
-                    logger.log(f"updated for a NEW lmax: {lmax}")
+                    lmax = t + delivery_times[i]
+                    if verbose:
+                        logger.log(f"updated for a NEW lmax: {lmax}")
+
+                succ = job_successor[i]
+                if succ >= 0:
+                    heapq.heappush(released, (release_dates[succ], succ))
             else:
-                next_release = min(self._release_dates[op] for op in remaining_ops)
-                logger.log(f"no ready ops - jumping to t = {next_release}")
+                next_release = released[0][0]
+                if verbose:
+                    logger.log(f"no ready ops - jumping to t = {next_release}")
                 t = next_release
 
-        logger.breakline()
+        if verbose:
+            logger.breakline()
 
-        logger.log("---------- schrage schedule summary ----------")
-        with logger:
-            logger.log(f"final sequence: {sequence}")
-            logger.log(f"start times: {start_times}")
-            logger.log(f"finish times: {finish_times}")
-            logger.log(f"final lmax: {lmax}")
-        logger.log("-" * 50)
+            logger.log("---------- schrage schedule summary ----------")
+            with logger:
+                logger.log(f"final sequence: {[operations[i] for i in sequence]}")
+                logger.log(
+                    f"start times: {dict((operations[i], start_times[i]) for i in sequence)}"
+                )
+                logger.log(
+                    f"finish times: {dict((operations[i], finish_times[i]) for i in sequence)}"
+                )
+                logger.log(f"final lmax: {lmax}")
+            logger.log("-" * 50)
 
-        logger.breakline()
+            logger.breakline()
 
         return lmax, start_times, finish_times, sequence
+
+    def preemptive_lmax(self) -> float:
+        # jackson's preemptive schedule: at every release the ready op with the largest
+        # delivery time takes the machine. its lmax is a lower bound for any sequence,
+        # job chains included, since it relaxes them together with non-preemption
+        release_dates = self._release_dates
+        delivery_times = self._delivery_times
+        remaining = list(self._processing_times)
+
+        num_ops = len(remaining)
+        by_release = sorted(range(num_ops), key=lambda i: release_dates[i])
+
+        ready = []
+        next_index = 0
+        t = release_dates[by_release[0]]
+        lmax = -float("inf")
+
+        while next_index < num_ops or ready:
+            while next_index < num_ops and release_dates[by_release[next_index]] <= t:
+                i = by_release[next_index]
+                heapq.heappush(ready, (-delivery_times[i], i))
+                next_index += 1
+
+            if not ready:
+                t = release_dates[by_release[next_index]]
+                continue
+
+            i = ready[0][1]
+            next_release = (
+                release_dates[by_release[next_index]]
+                if next_index < num_ops
+                else float("inf")
+            )
+
+            if t + remaining[i] <= next_release:
+                t += remaining[i]
+                heapq.heappop(ready)
+                lmax = max(lmax, t + delivery_times[i])
+            else:
+                remaining[i] -= next_release - t
+                t = next_release
+
+        return lmax
@@ -1,7 +1,9 @@
 import numpy as np
+import heapq
 from copy import copy
 
 from .solution import Solution
+from ...instance.instance import Instance
 from ...utils.logger import LOGGER
 
 
@@ -10,6 +12,7 @@ class SolutionBuilder:
         self._logger = copy(logger)
         self._logger.level += 1
         np.random.seed(seed)
+        self._rng = np.random.default_rng(seed)
 
     def _define_grasp_alpha(self, *, alpha: float = 0.35) -> None:
         self._grasp_alpha = alpha
@@ -61,13 +64,58 @@ class SolutionBuilder:
             logger.breakline()
 
             with logger:
-                for machine, ops in enumerate(solution._machine_sequence):
+                for machine, ops in enumerate(solution.machine_sequences()):
                     logger.log(f"machine {machine} scheduling: {ops}")
 
             logger.breakline()
 
         logger.log(f"initial solution built | makespan: {solution._makespan}")
 
+    def build_best_solution(
+        self,
+        *,
+        solution: Solution,
+        num_candidates: int = 8,
+        scheduler_approach: str = "event_driven",
+    ) -> None:
+        logger = self._logger
+
+        assignments = self.sample_assignments_grasp(
+            instance=solution._instance, num_samples=max(1, num_candidates)
+        )
+
+        best_candidate = None
+        for assignment in assignments:
+            candidate = Solution(instance=solution._instance, logger=solution._logger)
+            candidate.set_assignment(assignment)
+            self.schedule(solution=candidate, approach=scheduler_approach)
+            if best_candidate is None or candidate._makespan < best_candidate._makespan:
+                best_candidate = candidate
+
+        solution.copy_solution(sol=best_candidate)
+
+        logger.log(
+            f"best of {len(assignments)} grasp candidates built | makespan: {solution._makespan}"
+        )
+
+    def sample_assignments_grasp(
+        self, *, instance: Instance, num_samples: int
+    ) -> np.ndarray:
+        # samples 'num_samples' grasp assignments at once: each row holds one machine per
+        # op, drawn uniformly from the op's restricted candidates list
+        p_matrix = instance.p_matrix
+        eligible = np.isfinite(p_matrix)
+
+        p_min = p_matrix.min(axis=1, keepdims=True)
+        p_max = np.where(eligible, p_matrix, -np.inf).max(axis=1, keepdims=True)
+        restricted_candidates = eligible & (
+            p_matrix <= p_min + self._grasp_alpha * (p_max - p_min)
+        )
+
+        keys = self._rng.random((num_samples, *p_matrix.shape))
+        keys[:, ~restricted_candidates] = -1.0
+        return keys.argmax(axis=2).astype(np.int32)
+
     def select_machines(self, solution: Solution, strategy: str = "grasp") -> None:
         if strategy == "greedy":
             self._select_machines_greedy(solution)
@@ -80,6 +128,7 @@ class SolutionBuilder:
 
     def _select_machines_greedy(self, solution: Solution) -> None:
         instance = solution._instance
+        assignment = list()
         for o in instance.O:
             m_candidates = list()
             best_p = float("inf")
@@ -89,10 +138,12 @@ class SolutionBuilder:
                     best_p = instance.p[(o, m)]
                 elif instance.p[(o, m)] == best_p:
                     m_candidates.append(m)
-            solution._assign_vect[o] = np.random.choice(m_candidates)
+            assignment.append(np.random.choice(m_candidates))
+        solution.set_assignment(assignment)
 
     def _select_machines_grasp(self, solution: Solution) -> None:
         instance = solution._instance
+        assignment = list()
         for o in instance.O:
             candidates = dict()
             for m in instance.M_i[o]:
@@ -105,18 +156,23 @@ class SolutionBuilder:
                 + self._grasp_alpha
                 * (max(candidates.values()) - min(candidates.values()))
             ]
-            solution._assign_vect[o] = np.random.choice(restricted_candidates_list)
+            assignment.append(np.random.choice(restricted_candidates_list))
+        solution.set_assignment(assignment)
 
     def _select_machines_random(self, solution: Solution) -> None:
         instance = solution._instance
+        assignment = list()
         for o in instance.O:
-            solution._assign_vect[o] = np.random.choice(list(instance.M_i[o]))
+            assignment.append(np.random.choice(list(instance.M_i[o])))
+        solution.set_assignment(assignment)
 
     def schedule(
         self, *, solution: Solution, approach: str = "machine_by_machine"
     ) -> None:
         if approach == "machine_by_machine":
             self._schedule_machine_by_machine(solution=solution)
+        elif approach == "event_driven":
+            self._schedule_event_driven(solution=solution)
         else:
             self._logger.log("scheduler approach not implemented :c")
 
@@ -125,6 +181,7 @@ class SolutionBuilder:
             *, op: int, solution: Solution, current_machine: int
         ) -> tuple[float, float, float, int]:
             instance = solution._instance
+            assign_vect = solution._assign_vect
 
             job = instance.job_of_op[op]
             tech_seq = [i for (i, _) in instance.P_j[job]] + [instance.P_j[job][-1][1]]
@@ -132,11 +189,11 @@ class SolutionBuilder:
 
             local_remaining = 0.0
             for succ_op in remaining_ops:
-                if solution._assign_vect[succ_op] == current_machine:
+                if assign_vect[succ_op] == current_machine:
                     local_remaining += instance.p[(succ_op, current_machine)]
 
             global_remaining = sum(
-                instance.p[(succ_op, solution._assign_vect[succ_op])]
+                instance.p[(succ_op, int(assign_vect[succ_op]))]
                 for succ_op in remaining_ops
             )
 
@@ -146,6 +203,7 @@ class SolutionBuilder:
             return (local_remaining, global_remaining, proc_time, num_dependents)
 
         instance = solution._instance
+        assign_vect = solution._assign_vect.tolist()
 
         O = instance.O
         M = instance.M
@@ -171,7 +229,7 @@ class SolutionBuilder:
                 machine_ops = [
                     o
                     for o in O
-                    if solution._assign_vect[o] == m and o not in scheduled_ops
+                    if assign_vect[o] == m and o not in scheduled_ops
                 ]
 
                 ready_ops = [
@@ -213,12 +271,111 @@ class SolutionBuilder:
         for m in M:
             machines_sequence.append(list())
             for op in instance.O:
-                if solution._assign_vect[op] == m:
+                if assign_vect[op] == m:
                     machines_sequence[m].append((op, start_times[op]))
             machines_sequence[m].sort(key=lambda item: item[1])
             machines_sequence[m] = [item[0] for item in machines_sequence[m]]
 
-        solution._start_times = start_times
-        solution._finish_times = finish_times
-        solution._makespan = makespan
-        solution._machine_sequence = machines_sequence
+        solution.set_schedule(
+            start_times=start_times, finish_times=finish_times, makespan=makespan
+        )
+        solution.set_machine_sequences(machines_sequence)
+
+    def _schedule_event_driven(self, *, solution: Solution) -> None:
+        # list scheduling driven by machine-free events: the machine that frees up first
+        # takes its best ready op. same priority rule as machine_by_machine, but the
+        # priorities come from per-job suffix sums computed once and the ready ops of
+        # each machine sit in a heap, so a construction costs O(n log n)
+        instance = solution._instance
+        assign_vect = solution._assign_vect.tolist()
+        p = instance.p
+
+        num_ops = len(instance.O)
+        proc_time = [p[(op, assign_vect[op])] for op in range(num_ops)]
+
+        priority = [None] * num_ops
+        job_succ = [-1] * num_ops
+        for job_ops in instance.S_j.values():
+            global_remaining = 0.0
+            local_remaining = dict()
+            for idx in range(len(job_ops) - 1, -1, -1):
+                op = job_ops[idx]
+                machine = assign_vect[op]
+                # negated so heapq pops the highest priority, ties by lowest op id
+                priority[op] = (
+                    -local_remaining.get(machine, 0.0),
+                    -global_remaining,
+                    -proc_time[op],
+                    -(len(job_ops) - idx - 1),
+                    op,
+                )
+                global_remaining += proc_time[op]
+                local_remaining[machine] = (
+                    local_remaining.get(machine, 0.0) + proc_time[op]
+                )
+                if idx > 0:
+                    job_succ[job_ops[idx - 1]] = op
+
+        pred_count = [0] * num_ops
+        for op in range(num_ops):
+            if job_succ[op] >= 0:
+                pred_count[job_succ[op]] += 1
+
+        ready = [list() for _ in instance.M]
+        for op in range(num_ops):
+            if pred_count[op] == 0:
+                ready[assign_vect[op]].append(priority[op])
+        for machine_ready in ready:
+            heapq.heapify(machine_ready)
+
+        machine_time = [0.0] * instance.num_machines
+        events = [(0.0, m) for m in instance.M if ready[m]]
+        heapq.heapify(events)
+        idle = [not ready[m] for m in instance.M]
+
+        start_times = [-1.0] * num_ops
+        finish_times = [-1.0] * num_ops
+        release = [0.0] * num_ops
+        machines_sequence = [list() for _ in instance.M]
+        num_scheduled = 0
+
+        while events:
+            _, machine = heapq.heappop(events)
+            next_op = heapq.heappop(ready[machine])[-1]
+
+            start_time = max(release[next_op], machine_time[machine])
+            finish_time = start_time + proc_time[next_op]
+
+            start_times[next_op] = start_time
+            finish_times[next_op] = finish_time
+            machine_time[machine] = finish_time
+            machines_sequence[machine].append(next_op)
+            num_scheduled += 1
+
+            succ = job_succ[next_op]
+            if succ >= 0:
+                release[succ] = finish_time
+                pred_count[succ] -= 1
+                if pred_count[succ] == 0:
+                    succ_machine = assign_vect[succ]
+                    heapq.heappush(ready[succ_machine], priority[succ])
+                    if idle[succ_machine]:
+                        idle[succ_machine] = False
+                        heapq.heappush(
+                            events, (machine_time[succ_machine], succ_machine)
+                        )
+
+            if ready[machine]:
+                heapq.heappush(events, (finish_time, machine))
+            else:
+                idle[machine] = True
+
+        if num_scheduled < num_ops:
+            raise Exception("deadlock: no operation could be scheduled.")
+
+        solution.set_schedule(
+            start_times=start_times,
+            finish_times=finish_times,
+            makespan=max(finish_times),
+        )
+        solution.set_machine_sequences(machines_sequence)
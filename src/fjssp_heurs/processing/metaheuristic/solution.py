@@ -8,32 +8,212 @@ from pathlib import Path
 import numpy as np
 
 
+class _Share:
+    # an array or graph held by several solutions, 'holders' drops as they let it go
+    __slots__ = ("obj", "holders")
+
+    def __init__(self, obj) -> None:
+        self.obj = obj
+        self.holders = 1
+
+
 class Solution:
+    # compact array-backed representation:
+    #   _assign_vect[op]            machine of 'op' (int32, -1 while unassigned)
+    #   _start_times/_finish_times  float64 arrays indexed by op (nan while unscheduled)
+    #   _seq_ops[_seq_offsets[m]:_seq_offsets[m + 1]]  sequence of machine 'm'
+    #   _seq_pos[op]                position of 'op' in _seq_ops
+    # copies share these arrays (read-only) and the graph, counted in '_shares': a write
+    # copies them while another solution still holds them
+    __slots__ = (
+        "_instance",
+        "_logger",
+        "_assign_vect",
+        "_start_times",
+        "_finish_times",
+        "_seq_ops",
+        "_seq_offsets",
+        "_seq_pos",
+        "_makespan",
+        "_graph",
+        "_shares",
+    )
+
+    _ARRAYS = (
+        "_assign_vect",
+        "_start_times",
+        "_finish_times",
+        "_seq_ops",
+        "_seq_offsets",
+        "_seq_pos",
+    )
+
     def __init__(self, *, instance: Instance, logger: LOGGER):
         self._instance = instance
         self._logger = logger
+        self._shares = {}
         self._create_structure()
 
+    def __del__(self) -> None:
+        for name in list(getattr(self, "_shares", ())):
+            self._release(name)
+
     def copy_solution(self, *, sol) -> None:
-        self._assign_vect[:] = sol._assign_vect[:]
-        self._machine_sequence = sol._machine_sequence
+        for name in self._ARRAYS:
+            self._share_from(sol, name)
+            getattr(self, name).flags.writeable = False
+
         self._makespan = sol._makespan
 
-        if hasattr(sol, "_graph"):
-            self._graph = sol._graph
+        if sol._graph is not None:
+            self._share_from(sol, "_graph")
+        else:
+            self._release("_graph")
+            self._graph = None
+
+    def clone(self):
+        sol = Solution.__new__(Solution)
+        sol._instance = self._instance
+        sol._logger = self._logger
+        sol._shares = {}
+        sol.copy_solution(sol=self)
+        return sol
+
+    def _share_of(self, name: str):
+        # share of the object currently held under 'name', None when nobody else
+        # holds it. a share left behind by a reassigned slot is let go here
+        share = self._shares.get(name)
+        if share is not None and share.obj is not getattr(self, name):
+            self._release(name)
+            share = None
+        return share
+
+    def _release(self, name: str) -> None:
+        share = self._shares.pop(name, None)
+        if share is not None:
+            share.holders -= 1
+
+    def _share_from(self, sol, name: str) -> None:
+        share = sol._share_of(name)
+        if share is None:
+            share = sol._shares[name] = _Share(getattr(sol, name))
+
+        self._release(name)
+        setattr(self, name, share.obj)
+        self._shares[name] = share
+        share.holders += 1
+
+    def snapshot(self) -> dict:
+        # picklable copy of the schedule, used to move solutions between processes
+        state = {name: getattr(self, name).copy() for name in self._ARRAYS}
+        state["_makespan"] = self._makespan
+        return state
+
+    def restore(self, state: dict) -> None:
+        # inverse of 'snapshot': the graph is rebuilt from the machine sequences
+        for name in self._ARRAYS:
+            setattr(self, name, np.array(state[name]))
+        self._makespan = state["_makespan"]
 
-        self._start_times = sol._start_times
-        self._finish_times = sol._finish_times
+        self._graph = FJSSPGraph(
+            instance=self._instance,
+            machines_assignment=self.machine_sequences(),
+            tech_disjunc=True,
+            graph_type="complete fjssp",
+        )
 
     def _create_structure(self) -> None:
         instance = self._instance
+        num_ops = len(instance.O)
 
-        self._assign_vect = np.full(len(instance.O), np.nan)
-        self._machine_sequence = [[] for _ in instance.M]
+        self._assign_vect = np.full(num_ops, -1, dtype=np.int32)
+        self._seq_ops = np.empty(0, dtype=np.int32)
+        self._seq_offsets = np.zeros(instance.num_machines + 1, dtype=np.int32)
+        self._seq_pos = np.full(num_ops, -1, dtype=np.int32)
         self._makespan = float("inf")
 
-        self._start_times = list()
-        self._finish_times = list()
+        self._start_times = np.full(num_ops, np.nan)
+        self._finish_times = np.full(num_ops, np.nan)
+
+        self._graph = None
+
+    def _owned(self, name: str) -> np.ndarray:
+        share = self._share_of(name)
+        if share is not None:
+            self._release(name)
+            if share.holders > 0:
+                setattr(self, name, getattr(self, name).copy())
+            else:
+                # the other holders are gone, it can be written in place
+                getattr(self, name).flags.writeable = True
+        return getattr(self, name)
+
+    def _owned_graph(self) -> FJSSPGraph:
+        share = self._share_of("_graph")
+        if share is not None:
+            self._release("_graph")
+            if share.holders > 0:
+                self._graph = self._graph.copy()
+        return self._graph
+
+    def assign(self, op: int, machine: int) -> None:
+        self._owned("_assign_vect")[op] = machine
+
+    def set_assignment(self, assignment) -> None:
+        self._assign_vect = np.array(assignment, dtype=np.int32)
+
+    def set_schedule(self, *, start_times, finish_times, makespan: float) -> None:
+        self._start_times = np.array(start_times, dtype=np.float64)
+        self._finish_times = np.array(finish_times, dtype=np.float64)
+        self._makespan = makespan
+
+    def machine_sequence(self, machine: int) -> list[int]:
+        offsets = self._seq_offsets
+        return self._seq_ops[offsets[machine] : offsets[machine + 1]].tolist()
+
+    def machine_sequences(self) -> list[list[int]]:
+        seq_ops = self._seq_ops.tolist()
+        offsets = self._seq_offsets.tolist()
+        return [
+            seq_ops[offsets[m] : offsets[m + 1]] for m in range(len(offsets) - 1)
+        ]
+
+    def set_machine_sequence(self, machine: int, sequence: list[int]) -> None:
+        offsets = self._seq_offsets
+        start, end = offsets[machine], offsets[machine + 1]
+
+        if end - start == len(sequence):
+            self._owned("_seq_ops")[start:end] = sequence
+            self._owned("_seq_pos")[sequence] = np.arange(start, end, dtype=np.int32)
+        else:
+            sequences = self.machine_sequences()
+            sequences[machine] = sequence
+            self.set_machine_sequences(sequences)
+
+    def set_machine_sequences(self, sequences: list[list[int]]) -> None:
+        self._seq_ops = np.fromiter(
+            (op for sequence in sequences for op in sequence), dtype=np.int32
+        )
+        self._seq_offsets = np.zeros(len(sequences) + 1, dtype=np.int32)
+        np.cumsum([len(sequence) for sequence in sequences], out=self._seq_offsets[1:])
+        self._refresh_seq_pos()
+
+    def _refresh_seq_pos(self) -> None:
+        self._seq_pos = np.full(len(self._instance.O), -1, dtype=np.int32)
+        self._seq_pos[self._seq_ops] = np.arange(len(self._seq_ops), dtype=np.int32)
+
+    def _sequence_by_assignment(self) -> None:
+        # every machine sequence becomes its assigned ops in increasing id order
+        self._seq_ops = np.argsort(self._assign_vect, kind="stable").astype(np.int32)
+        self._seq_offsets = np.zeros(self._instance.num_machines + 1, dtype=np.int32)
+        np.cumsum(
+            np.bincount(self._assign_vect, minlength=self._instance.num_machines),
+            out=self._seq_offsets[1:],
+        )
+        self._refresh_seq_pos()
+
+    def sequence_key(self) -> int:
+        return hash((self._seq_ops.tobytes(), self._seq_offsets.tobytes()))
 
     def create_graph(self, *, tech_disjunc: bool = False, graph_type: str):
         self._graph = FJSSPGraph(
@@ -43,6 +223,15 @@ class Solution:
             graph_type=graph_type,
         )
 
+    def patch_graph(
+        self, *, parent, moves: list[tuple[int, int]], tech_disjunc: bool = False
+    ) -> None:
+        if parent._graph is None:
+            self.create_graph(tech_disjunc=tech_disjunc, graph_type="partial fjssp")
+            return
+
+        self._graph = parent._graph.apply_moves(moves, tech_disjunc=tech_disjunc)
+
     def export_dag(
         self,
         dag_output_path: Path,
@@ -54,17 +243,21 @@ class Solution:
             output_path=dag_output_path, title=title, arrowstyle=arrowstyle, show=show
         )
 
-    def _find_a_critical_path(self) -> tuple[list[int], int]:
+    def _find_a_critical_path(self) -> tuple[list[int], int, list[list[int]]]:
+        # also returns the path's critical blocks: maximal runs of operations processed
+        # back to back on the same machine
         instance = self._instance
         start_times = self._start_times
         finish_times = self._finish_times
         assign_vect = self._assign_vect
-        machine_sequence = self._machine_sequence
+        seq_ops = self._seq_ops
+        seq_pos = self._seq_pos
+        seq_offsets = self._seq_offsets
         makespan = self._makespan
 
         multiple_critical_paths = 0
 
-        end_ops = [op for op in instance.O if finish_times.index(makespan) == op]
+        end_ops = np.flatnonzero(finish_times == makespan)[:1].tolist()
         if not end_ops:
             raise ValueError("no operations with finish time = makespan.")
 
@@ -73,23 +266,22 @@ class Solution:
 
         current_op = np.random.choice(end_ops)
         critical_path = [current_op]
+        critical_blocks = [[current_op]]
 
         while start_times[current_op] > 0:
             pred_ops = []
+            prev_mach_op = None
 
-            job = instance.job_of_op[current_op]
-            job_ops = instance.S_j[job]
-            idx_in_job = job_ops.index(current_op)
+            idx_in_job = instance.pos_in_job[current_op]
             if idx_in_job > 0:
-                prev_job_op = job_ops[idx_in_job - 1]
+                job = instance.job_of_op[current_op]
+                prev_job_op = instance.S_j[job][idx_in_job - 1]
                 if finish_times[prev_job_op] == start_times[current_op]:
                     pred_ops.append(prev_job_op)
 
-            machine = int(assign_vect[current_op])
-            mach_ops = machine_sequence[machine]
-            idx_in_machine = mach_ops.index(current_op)
-            if idx_in_machine > 0:
-                prev_mach_op = mach_ops[idx_in_machine - 1]
+            idx_in_machine = seq_pos[current_op]
+            if idx_in_machine > seq_offsets[assign_vect[current_op]]:
+                prev_mach_op = int(seq_ops[idx_in_machine - 1])
                 if finish_times[prev_mach_op] == start_times[current_op]:
                     pred_ops.append(prev_mach_op)
 
@@ -100,38 +292,47 @@ class Solution:
                 multiple_critical_paths = 1
 
             current_op = np.random.choice(pred_ops)
-            critical_path.insert(0, current_op)
-
-        return list(map(lambda x: int(x), critical_path)), multiple_critical_paths
+            critical_path.append(current_op)
+            if current_op == prev_mach_op:
+                critical_blocks[-1].append(current_op)
+            else:
+                critical_blocks.append([current_op])
+
+        critical_path.reverse()
+        critical_blocks.reverse()
+        return (
+            list(map(lambda x: int(x), critical_path)),
+            multiple_critical_paths,
+            [[int(op) for op in reversed(block)] for block in critical_blocks],
+        )
 
     def _get_machines_assignment(self):
         instance = self._instance
 
         machines_assignment = [list() for _ in instance.M]
-        for op in instance.O:
-            machine = self._assign_vect[op]
-            machines_assignment[int(machine)].append(op)
+        for op, machine in enumerate(self._assign_vect.tolist()):
+            machines_assignment[machine].append(op)
 
         return machines_assignment
 
     def reset_to_jssp(self) -> None:
-        self._machine_sequence = self._get_machines_assignment()
-        self._start_times = []
-        self._finish_times = []
+        self._sequence_by_assignment()
+        self._start_times = np.full(len(self._instance.O), np.nan)
+        self._finish_times = np.full(len(self._instance.O), np.nan)
         self._makespan = float("inf")
-        if hasattr(self, "_graph"):
+        if self._graph is not None:
             self._graph = FJSSPGraph(
                 instance=self._instance,
-                machines_assignment=self._machine_sequence,
+                machines_assignment=self.machine_sequences(),
                 tech_disjunc=True,
                 graph_type="partial fjssp",
             )
-
+    
     def _recalculate_times(self, logger: LOGGER) -> float:
         if not all(
             self._graph._are_sequence_consolidated(machine_id=m)
-            for m, seq in enumerate(self._machine_sequence)
-            if seq
+            for m in range(self._instance.num_machines)
+            if self._seq_offsets[m + 1] > self._seq_offsets[m]
         ):
             with logger:
                 logger.log(
@@ -140,24 +341,22 @@ class Solution:
 
                 """
                 print("consolidating it")
-                for m, ops in enumerate(self._machine_sequence):
+                for m, ops in enumerate(self.machine_sequences()):
                     self._graph.consolidate_sequence_on_machine(machine_id=m, sequence=ops)
                 """
                 logger.log("ignoring it")
 
         instance = self._instance
-        self._start_times = []
-        self._finish_times = []
 
-        for op in instance.O:
-            start_time = self._graph.longest_path_to(op=op)
-            machine = int(self._assign_vect[op])
-            processing_time = instance.p[(op, machine)]
+        heads, _ = self._graph.heads_and_tails()
+        processing_times = instance.p_matrix[
+            np.arange(len(instance.O)), self._assign_vect
+        ]
 
-            self._start_times.append(start_time)
-            self._finish_times.append(start_time + processing_time)
+        self._start_times = heads
+        self._finish_times = heads + processing_times
 
-        self._makespan = max(self._finish_times)
+        self._makespan = float(self._finish_times.max())
         return self._makespan
 
     def save_gantt(self, *, gantt_output: Path, gantt_title: str) -> None:
@@ -172,7 +371,7 @@ class Solution:
             try:
                 plot_gantt(
                     start_times=self._start_times,
-                    machine_assignments=self._machine_sequence,
+                    machine_assignments=self.machine_sequences(),
                     instance=self._instance,
                     title=f"{self._instance._instance_name} - gantt - {gantt_title}",
                     verbose=False,
@@ -191,9 +390,9 @@ class Solution:
         logger = self._logger
 
         if (
-            np.isnan(self._assign_vect).all()
-            or not self._start_times
-            or not self._finish_times
+            (self._assign_vect < 0).all()
+            or np.isnan(self._start_times).all()
+            or np.isnan(self._finish_times).all()
         ):
             with logger:
                 logger.log("empty solution")
@@ -202,6 +401,7 @@ class Solution:
         with logger:
             instance = self._instance
             makespan = self._makespan
+            start_times = self._start_times.tolist()
 
             logger.log(
                 f"makespan: {makespan} | "
@@ -209,19 +409,19 @@ class Solution:
             )
 
             if print_style == "each_op":
-                for op in instance.O:
+                for op, machine in enumerate(self._assign_vect.tolist()):
                     logger.log(
                         f"op: {op} | "
-                        f"machine: {self._assign_vect[op]} | "
-                        f"start: {self._start_times[op]} | "
-                        f"end: {self._start_times[op] + instance.p[(op, self._assign_vect[op])]}"
+                        f"machine: {machine} | "
+                        f"start: {start_times[op]} | "
+                        f"end: {start_times[op] + instance.p[(op, machine)]}"
                     )
 
             elif print_style == "arrays":
-                for m, ops in enumerate(self._machine_sequence):
+                for m, ops in enumerate(self.machine_sequences()):
                     logger.log(
                         f"m: {m} | "
                         f"seq: {ops} | "
-                        f"starts: {[self._start_times[op] for op in ops]} | "
-                        f"ends: {[(self._start_times[op] + instance.p[(op, m)]) for op in ops]}"
+                        f"starts: {[start_times[op] for op in ops]} | "
+                        f"ends: {[(start_times[op] + instance.p[(op, m)]) for op in ops]}"
                     )
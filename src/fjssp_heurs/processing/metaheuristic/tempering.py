@@ -0,0 +1,385 @@
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from typing import Callable
+import os
+
+import numpy as np
+
+from ...instance.instance import Instance
+from ...utils.logger import LOGGER
+from ...utils.crono import Crono
+from ...utils.gap import evaluate_gap
+from .solution import Solution
+from .localsearch import LocalSearch
+from .solbuilder import SolutionBuilder
+from .sa import metropolis_acceptance
+from .sbp.sbp import ShiftingBottleneck
+
+
+class _Replica:
+    """
+    Search state of a single replica, living in its own worker process.
+
+    A replica keeps its current and best solutions, its tabu list and its neighborhood intensity
+    across temperatures: swaps move temperatures between replicas, never solutions.
+    """
+
+    def __init__(
+        self,
+        instance: Instance,
+        state: dict,
+        seed: int,
+        sbp_screening_k: int,
+        sbp_carlier_mode: str,
+        sbp_carlier_max_nodes: int,
+        grasp_candidates: int,
+    ) -> None:
+        self.logger = LOGGER(log_path=os.devnull, out="off")
+
+        self.current = Solution(instance=instance, logger=self.logger)
+        self.current.restore(state)
+        self.best = self.current.clone()
+
+        self.sbp_solver = ShiftingBottleneck(
+            log_out="off",
+            screening_k=sbp_screening_k,
+            carlier_mode=sbp_carlier_mode,
+            carlier_max_nodes=sbp_carlier_max_nodes,
+        )
+        self.local_search = LocalSearch(logger=self.logger, seed=seed)
+        self.local_search._define_jssp_solver(sbp=self.sbp_solver)
+        self.builder = SolutionBuilder(logger=self.logger, seed=seed)
+        self.grasp_candidates = grasp_candidates
+
+        self.intensity_level: int = 0
+        self.max_intensity_level: int = 3
+        self.no_improvement_counter: int = 0
+        self.stagnation_limit: int = int(0.8 * 2 * len(instance.O))
+        self.iterations: int = 0
+
+    def _grasp(self) -> None:
+        """Restarts the current solution with GRASP when no neighbor can be generated."""
+        self.builder.define_hiperparams(alpha_grasp=0.5)
+        self.builder.build_best_solution(
+            solution=self.current,
+            num_candidates=self.grasp_candidates,
+            scheduler_approach="event_driven",
+        )
+        self.current.create_graph(tech_disjunc=True, graph_type="complete fjssp")
+        self.intensity_level = 0
+        self.no_improvement_counter = 0
+
+        if self.current._makespan < self.best._makespan:
+            self.best.copy_solution(sol=self.current)
+
+    def step(self, temperature: float, T_rel: float) -> None:
+        """
+        Runs one SA iteration at a fixed temperature.
+
+        Args:
+            temperature: Temperature currently held by the replica.
+            T_rel: Temperature relative to the hottest one of the ladder.
+        """
+        self.iterations += 1
+        current = self.current
+
+        critical_path, more_criticals, _ = current._find_a_critical_path()
+        if more_criticals == 0 and not [
+            op for op in critical_path if len(current._instance.M_i[op]) > 1
+        ]:
+            self._grasp()
+            return
+
+        makespan_prime, sol_prime = self.local_search.generate_adaptive_neighbor_with_tabu(
+            sol=current, intensity_level=self.intensity_level, T_rel=T_rel
+        )
+        if sol_prime is None:
+            self._grasp()
+            return
+
+        delta = current._makespan - makespan_prime
+        if delta >= 0 or metropolis_acceptance(delta, temperature)[0]:
+            current.copy_solution(sol=sol_prime)
+
+        if makespan_prime < self.best._makespan:
+            self.best.copy_solution(sol=sol_prime)
+            self.intensity_level = 0
+            self.no_improvement_counter = 0
+        else:
+            self.no_improvement_counter += 1
+            if self.no_improvement_counter > self.stagnation_limit:
+                self.no_improvement_counter = 0
+                self.intensity_level = (self.intensity_level + 1) % (
+                    self.max_intensity_level + 1
+                )
+
+
+def _replica_worker(
+    conn: Connection,
+    instance: Instance,
+    state: dict,
+    seed: int,
+    sbp_screening_k: int,
+    sbp_carlier_mode: str,
+    sbp_carlier_max_nodes: int,
+    grasp_candidates: int,
+) -> None:
+    # messages: ("run", temperature, T_rel, steps, time_limit), answered with the current
+    # and best makespans, and ("finish",), answered with the best solution
+    replica = _Replica(
+        instance=instance,
+        state=state,
+        seed=seed,
+        sbp_screening_k=sbp_screening_k,
+        sbp_carlier_mode=sbp_carlier_mode,
+        sbp_carlier_max_nodes=sbp_carlier_max_nodes,
+        grasp_candidates=grasp_candidates,
+    )
+
+    while True:
+        message = conn.recv()
+        if message[0] == "run":
+            _, temperature, T_rel, steps, time_limit = message
+            timer = Crono()
+            for _ in range(steps):
+                replica.step(temperature, T_rel)
+                if timer.elapsed_time() >= time_limit:
+                    break
+            conn.send((replica.current._makespan, replica.best._makespan))
+        else:
+            conn.send((replica.best.snapshot(), replica.iterations))
+            break
+
+    replica.sbp_solver.close()
+    conn.close()
+
+
+class ParallelTempering:
+    """
+    Implements parallel tempering (replica exchange) for the FJSSP on top of the SA moves.
+
+    Every replica runs the SA neighborhood and acceptance rule at a fixed temperature of a
+    geometric ladder, in its own process. After every `swap_interval` iterations, replicas held
+    at adjacent temperatures swap them according to the Metropolis swap criterion.
+    """
+
+    def __init__(
+        self,
+        logger: LOGGER,
+        replicas: int = 4,
+        max_time: int = 300,
+        min_temperature: float = 0.01,
+        max_temperature: float = None,
+        swap_interval: int = 20,
+        sbp_screening_k: int = None,
+        sbp_carlier_mode: str = "depth_first",
+        sbp_carlier_max_nodes: int = None,
+        grasp_candidates: int = 8,
+        on_new_best: Callable[[float], None] = None,
+        seed: int = 42,
+    ) -> None:
+        """
+        Initializes the parallel tempering optimizer.
+
+        Args:
+            logger: Logger for the main process; replicas themselves don't log.
+            replicas: Number of replicas (and temperatures of the ladder), at least 2.
+            max_time: Maximum runtime in seconds.
+            min_temperature: Coldest temperature of the ladder.
+            max_temperature: Hottest temperature of the ladder. If None, 10% of the initial
+                makespan, the lower limit of the SA initial temperature calibration.
+            swap_interval: Iterations run by every replica between two swap rounds.
+            sbp_screening_k: Bottleneck screening of every replica's SBP (None disables it).
+            sbp_carlier_mode: Search mode of the Carlier solvers of every replica's SBP.
+            sbp_carlier_max_nodes: Node budget of the best-first Carlier search (None for no limit).
+            grasp_candidates: Number of GRASP solutions sampled on each restart.
+            on_new_best: Called with the best makespan whenever a swap round improves it.
+            seed: Root seed from which every replica's seed is spawned.
+        """
+        if replicas < 2:
+            raise ValueError("parallel tempering needs at least 2 replicas")
+
+        self.logger: LOGGER = logger
+        self.replicas: int = replicas
+        self.max_time: int = max_time
+        self.min_temperature: float = min_temperature
+        self.max_temperature: float = max_temperature
+        self.swap_interval: int = swap_interval
+        self.sbp_screening_k: int = sbp_screening_k
+        self.sbp_carlier_mode: str = sbp_carlier_mode
+        self.sbp_carlier_max_nodes: int = sbp_carlier_max_nodes
+        self.grasp_candidates: int = grasp_candidates
+        self.on_new_best: Callable[[float], None] = on_new_best
+
+        self.seeds: list[int] = [
+            int(child.generate_state(1)[0])
+            for child in np.random.SeedSequence(seed).spawn(replicas)
+        ]
+        self.ladder: list[float] = []
+        self.swap_attempts: list[int] = [0] * (replicas - 1)
+        self.swap_accepts: list[int] = [0] * (replicas - 1)
+        self.rounds: int = 0
+
+        np.random.seed(seed)
+
+    def _temperature_ladder(self, makespan: float) -> list[float]:
+        """
+        Builds the geometric temperature ladder, from the coldest to the hottest temperature.
+
+        Args:
+            makespan: Makespan of the initial solution, used for the default hottest temperature.
+
+        Returns:
+            The temperature of every ladder position.
+        """
+        t_min = self.min_temperature
+        t_max = (
+            self.max_temperature
+            if self.max_temperature is not None
+            else max(0.1 * makespan, t_min)
+        )
+        ratio = t_max / t_min
+
+        return [
+            t_min * ratio ** (k / (self.replicas - 1)) for k in range(self.replicas)
+        ]
+
+    def _swap_round(self, holders: list[int], energies: list[float]) -> None:
+        """
+        Attempts the Metropolis swaps between adjacent temperatures, alternating even and odd pairs.
+
+        Args:
+            holders: Replica held at every ladder position, updated in place.
+            energies: Current makespan of every replica.
+        """
+        ladder = self.ladder
+
+        for k in range(self.rounds % 2, self.replicas - 1, 2):
+            i, j = holders[k], holders[k + 1]
+            exponent = (1 / ladder[k] - 1 / ladder[k + 1]) * (energies[i] - energies[j])
+
+            self.swap_attempts[k] += 1
+            if exponent >= 0 or metropolis_acceptance(exponent, 1.0)[0]:
+                holders[k], holders[k + 1] = j, i
+                self.swap_accepts[k] += 1
+
+        self.rounds += 1
+
+    def optimize(self, solution: Solution) -> tuple[Solution, float, float]:
+        """
+        Runs the replicas from the given solution until the time limit is reached.
+
+        Args:
+            solution: The initial Solution object shared by all replicas.
+
+        Returns:
+            The best Solution, the total runtime in seconds and its gap to the known optimum.
+        """
+        logger = self.logger
+        instance = solution._instance
+        timer = Crono()
+
+        self.ladder = self._temperature_ladder(solution._makespan)
+        state = solution.snapshot()
+
+        with logger:
+            logger.log(
+                f"parallel tempering has started | replicas: {self.replicas} | "
+                f"ladder: {[round(T, 4) for T in self.ladder]} | "
+                f"swap interval: {self.swap_interval} its"
+            )
+
+            connections = []
+            processes = []
+            for seed in self.seeds:
+                parent_conn, child_conn = Pipe()
+                process = Process(
+                    target=_replica_worker,
+                    args=(
+                        child_conn,
+                        instance,
+                        state,
+                        seed,
+                        self.sbp_screening_k,
+                        self.sbp_carlier_mode,
+                        self.sbp_carlier_max_nodes,
+                        self.grasp_candidates,
+                    ),
+                    daemon=True,
+                )
+                process.start()
+                child_conn.close()
+                connections.append(parent_conn)
+                processes.append(process)
+
+            try:
+                # holders[k] is the replica currently at temperature ladder[k]
+                holders = list(range(self.replicas))
+                energies = [solution._makespan] * self.replicas
+                best_makespan = solution._makespan
+
+                while timer.elapsed_time() < self.max_time:
+                    time_left = self.max_time - timer.elapsed_time()
+                    for k, replica in enumerate(holders):
+                        connections[replica].send(
+                            (
+                                "run",
+                                self.ladder[k],
+                                self.ladder[k] / self.ladder[-1],
+                                self.swap_interval,
+                                time_left,
+                            )
+                        )
+
+                    round_best = best_makespan
+                    for replica, conn in enumerate(connections):
+                        energies[replica], replica_best = conn.recv()
+                        if replica_best < best_makespan:
+                            best_makespan = replica_best
+                            logger.log(
+                                f"new best: {best_makespan} | replica {replica} | "
+                                f"time: {timer.elapsed_time():.2f}s"
+                            )
+
+                    if self.on_new_best is not None and best_makespan < round_best:
+                        self.on_new_best(best_makespan)
+
+                    self._swap_round(holders, energies)
+
+                results = []
+                for conn in connections:
+                    conn.send(("finish",))
+                    results.append(conn.recv())
+            finally:
+                for process in processes:
+                    process.join(timeout=5)
+                    if process.is_alive():
+                        process.terminate()
+
+            with logger:
+                logger.log(
+                    f"swap acceptance by ladder pair: "
+                    f"{[round(a / t, 3) if t else None for a, t in zip(self.swap_accepts, self.swap_attempts)]}"
+                )
+                logger.log(
+                    f"iterations by replica: {[iterations for _, iterations in results]}"
+                )
+
+            # ties go to the smallest replica index
+            best_state = min(
+                (state for state, _ in results), key=lambda state: state["_makespan"]
+            )
+            best_solution = Solution(instance=instance, logger=solution._logger)
+            best_solution.restore(best_state)
+
+            runtime = timer.elapsed_time()
+            logger.log(
+                f"parallel tempering finished | best: {best_solution._makespan} | "
+                f"swap rounds: {self.rounds} | runtime: {runtime:.2f}s"
+            )
+
+        return (
+            best_solution,
+            runtime,
+            evaluate_gap(ub=best_solution._makespan, lb=instance.optimal_solution),
+        )
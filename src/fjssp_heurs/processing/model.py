@@ -4,36 +4,183 @@ from ..utils.logger import LOGGER
 from ..utils.plotting import plot_gantt
 from ..utils.gap import evaluate_gap
 from ..utils.graph import FJSSPGraph
-
-from mip import Model, xsum, minimize, CBC, OptimizationStatus, BINARY, CONTINUOUS
+from .metaheuristic.solution import Solution
+
+from mip import (
+    Model,
+    ConstrsGenerator,
+    xsum,
+    minimize,
+    CBC,
+    OptimizationStatus,
+    BINARY,
+    CONTINUOUS,
+)
+from multiprocessing.connection import Connection
 from pathlib import Path
+import numpy as np
+import hashlib
+import tempfile
+import json
+import os
+
+
+class _SharedCutoff(ConstrsGenerator):
+    # brings the shared cutoff into a running solve: at the nodes where cbc asks for cuts,
+    # a relaxation whose makespan isn't strictly better than it is cut off by
+    # c_max <= cutoff - step, so cbc prunes nodes that can't beat the best makespan known
+    # elsewhere
+    def __init__(self, c_max, cutoff, step: float):
+        super().__init__()
+        self.c_max = c_max
+        self.cutoff = cutoff
+        self.step = step
+        self.seen = cutoff.value
+
+    def generate_constrs(self, model, depth: int = 0, npass: int = 0):
+        self.seen = self.cutoff.value
+        c_max = model.translate(self.c_max)
+        if c_max is not None and c_max.x > self.seen - self.step:
+            model.add_cut(c_max <= self.seen - self.step)
+
+
+def solve_in_process(
+    conn: Connection,
+    instance: Instance,
+    time_limit: float,
+    cutoff,
+    start_state: dict = None,
+    bulk_build: bool = False,
+    cache_dir: Path = None,
+) -> None:
+    # runs in a child process next to the SA. 'cutoff' is a shared value holding the best
+    # makespan known elsewhere: it is the initial cbc cutoff and later values reach the
+    # single solve through a cut generator. 'start_state' is a solution snapshot used as
+    # mip start, its makespan also bounds the model's horizon
+    logger = LOGGER(log_path=os.devnull, out="off")
+
+    start = None
+    if start_state is not None:
+        start = Solution(instance=instance, logger=logger)
+        start.restore(start_state)
+
+    math_model = MathModel(
+        instance=instance,
+        logger=logger,
+        upper_bound=start._makespan if start is not None else None,
+        bulk_build=bulk_build,
+        cache_dir=cache_dir,
+    )
+
+    # with integer processing times, a better makespan is smaller by at least 1
+    step = 1.0 if all(float(p).is_integer() for p in instance.p.values()) else 1e-6
+    shared_cutoff = _SharedCutoff(c_max=math_model.c_max, cutoff=cutoff, step=step)
+    math_model.model.cuts_generator = shared_cutoff
+
+    initial_cutoff = shared_cutoff.seen
+    # a cutoff at the start's makespan would discard the start itself
+    use_start = start is not None and initial_cutoff >= start._makespan
+
+    timer = Crono()
+    math_model.optimize(
+        time_limit=time_limit,
+        cutoff=None if use_start else initial_cutoff,
+        start=start if use_start else None,
+    )
+
+    result = math_model.result()
+    # without a better solution, an infeasible model proves the last cutoff optimal
+    result["cutoff"] = shared_cutoff.seen
+    result["proven"] = math_model._status in [
+        OptimizationStatus.OPTIMAL,
+        OptimizationStatus.INFEASIBLE,
+    ]
+
+    result["elapsed_time"] = round(timer.elapsed_time(), 4)
+    conn.send(result)
+    conn.close()
 
 
 class MathModel:
-    def __init__(self, *, instance: Instance, logger: LOGGER) -> None:
+    def __init__(
+        self,
+        *,
+        instance: Instance,
+        logger: LOGGER,
+        build_model: bool = True,
+        upper_bound: float = None,
+        bulk_build: bool = False,
+        cache_dir: Path = None,
+    ) -> None:
         self._instance = instance
+        # makespan of a known solution: the model only keeps schedules that end by then
+        self._upper_bound = upper_bound
+        # the bulk build writes the whole model as an lp file, kept in 'cache_dir' (when
+        # given) under a hash of the instance, so later runs only read it back
+        self._bulk_build = bulk_build or cache_dir is not None
+        self._cache_dir = cache_dir
         self._elapsed_time = 0.0
         self._logger = logger
 
-        self._makespan = 0.0
+        self._makespan = None
         self._assign_vect = list()
         self._machine_scheduling = list()
         self._start_times = list()
+        self._status = None
+
+        # without the model, a solution solved elsewhere can still be loaded, printed and
+        # exported through 'load_result'
+        if not build_model:
+            return
 
         h = 1
         with logger:
-            for status in self._create_model():
+            build = self._create_model_bulk if self._bulk_build else self._create_model
+            for status in build():
                 logger.log(f"[{h}] {status}")
                 h += 1
 
+    def _horizon(self) -> float:
+        # running every op one after the other on its fastest machine is always feasible,
+        # so some optimal schedule ends by this horizon
+        instance = self._instance
+        return sum(min(instance.p[(i, m)] for m in instance.M_i[i]) for i in instance.O)
+
+    def _time_bounds(self, *, horizon: float) -> tuple:
+        # earliest start from the job predecessors and latest start from the job
+        # successors, both with the fastest machine of every op
+        instance = self._instance
+
+        p_min = {i: min(instance.p[(i, m)] for m in instance.M_i[i]) for i in instance.O}
+        earliest = dict()
+        latest = dict()
+        for seq in instance.S_j.values():
+            head = 0
+            for i in seq:
+                earliest[i] = head
+                head += p_min[i]
+            tail = 0
+            for i in reversed(seq):
+                latest[i] = horizon - tail - p_min[i]
+                tail += p_min[i]
+        job_length = max(sum(p_min[i] for i in seq) for seq in instance.S_j.values())
+
+        return earliest, latest, job_length
+
     def _create_model(self):
         instance = self._instance
 
         self.model = Model("FJSSP", solver_name=CBC)
-        big_m = 1e5
+
+        horizon = self._horizon()
+        if self._upper_bound is not None:
+            horizon = min(horizon, self._upper_bound)
+        earliest, latest, job_length = self._time_bounds(horizon=horizon)
 
         x = {
-            i: self.model.add_var(name=f"x_{i}", var_type=CONTINUOUS, lb=0.0)
+            i: self.model.add_var(
+                name=f"x_{i}", var_type=CONTINUOUS, lb=earliest[i], ub=latest[i]
+            )
             for i in instance.O
         }
         z = {
@@ -48,9 +195,11 @@ class MathModel:
             for j in instance.O_m[m]
             if i < j
         }
-        c_max = self.model.add_var(name="c_max", var_type=CONTINUOUS, lb=0.0)
+        c_max = self.model.add_var(
+            name="c_max", var_type=CONTINUOUS, lb=job_length, ub=horizon
+        )
 
-        yield "decision vars created"
+        yield f"decision vars created | horizon: {horizon}"
 
         self.model.objective = minimize(c_max)
 
@@ -96,12 +245,15 @@ class MathModel:
                         continue
                     pij = instance.p.get((i, m), 0)
                     pji = instance.p.get((j, m), 0)
+                    # largest violation each constraint may need to relax within the bounds
+                    m_ij = max(latest[i] + pij - earliest[j], 0)
+                    m_ji = max(latest[j] + pji - earliest[i], 0)
 
                     self.model += (
                         x.get(j, 0)
                         >= x.get(i, 0)
                         + pij
-                        - big_m
+                        - m_ij
                         * (
                             1
                             - y.get((i, j, m), 0)
@@ -117,7 +269,7 @@ class MathModel:
                         x.get(i, 0)
                         >= x.get(j, 0)
                         + pji
-                        - big_m
+                        - m_ji
                         * (
                             y.get((i, j, m), 0)
                             + 1
@@ -135,16 +287,157 @@ class MathModel:
         self.y = y
         self.c_max = c_max
 
+    def _model_key(self) -> str:
+        # the lp file only depends on the processing times and the job sequences
+        instance = self._instance
+        content = json.dumps(
+            {
+                "format": 1,
+                "p": sorted([i, m, p] for (i, m), p in instance.p.items()),
+                "jobs": [instance.S_j[j] for j in sorted(instance.S_j)],
+            }
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+    def _write_lp(self, *, lp_path: Path, horizon: float) -> None:
+        # same model as '_create_model', with every row generated from index arrays:
+        # the no-overlap pairs of a machine come from the upper triangle of its ops
+        instance = self._instance
+        earliest, latest, job_length = self._time_bounds(horizon=horizon)
+
+        lines = ["\\ FJSSP", "Minimize", " obj: c_max", "Subject To"]
+
+        for i in instance.O:
+            terms = " ".join(f"- {instance.p[(i, m)]} z_{i}_{m}" for m in instance.M_i[i])
+            lines.append(f" makespan_def_{i}: c_max - x_{i} {terms} >= 0")
+
+        for j in range(instance.num_jobs):
+            for i, i_ in instance.P_j[j]:
+                terms = " ".join(
+                    f"- {instance.p[(i, m)]} z_{i}_{m}" for m in instance.M_i[i]
+                )
+                lines.append(f" preced_{i}_{i_}: x_{i_} - x_{i} {terms} >= 0")
+
+        for i in instance.O:
+            terms = " + ".join(f"z_{i}_{m}" for m in instance.M_i[i])
+            lines.append(f" machine_assign_{i}: {terms} = 1")
+
+        earliest_arr = np.array([earliest[i] for i in instance.O], dtype=float)
+        latest_arr = np.array([latest[i] for i in instance.O], dtype=float)
+        binaries = [f"z_{i}_{m}" for i in instance.O for m in instance.M_i[i]]
+
+        for m in instance.M:
+            ops = np.array(instance.O_m[m])
+            if len(ops) < 2:
+                continue
+            p_m = np.array([instance.p[(i, m)] for i in instance.O_m[m]], dtype=float)
+            # O_m lists ops in increasing id, so the upper triangle gives every i < j
+            a, b = np.triu_indices(len(ops), k=1)
+            I, J = ops[a].tolist(), ops[b].tolist()
+            p_i, p_j = p_m[a], p_m[b]
+            m_ij = np.maximum(latest_arr[I] + p_i - earliest_arr[J], 0)
+            m_ji = np.maximum(latest_arr[J] + p_j - earliest_arr[I], 0)
+
+            # x_j >= x_i + p_i - M (3 - y - z_i - z_j) and x_i >= x_j + p_j - M (2 + y - z_i - z_j)
+            for i, j, pi, pj, mij, mji in zip(
+                I, J, p_i.tolist(), p_j.tolist(), m_ij.tolist(), m_ji.tolist()
+            ):
+                y = f"y_{i}_{j}_{m}"
+                lines.append(
+                    f" no_overlap_1_{i}_{j}_{m}: x_{j} - x_{i} - {mij} {y}"
+                    f" - {mij} z_{i}_{m} - {mij} z_{j}_{m} >= {pi - 3 * mij}"
+                )
+                lines.append(
+                    f" no_overlap_2_{i}_{j}_{m}: x_{i} - x_{j} + {mji} {y}"
+                    f" - {mji} z_{i}_{m} - {mji} z_{j}_{m} >= {pj - 2 * mji}"
+                )
+                binaries.append(y)
+
+        lines.append("Bounds")
+        lines.extend(f" {earliest[i]} <= x_{i} <= {latest[i]}" for i in instance.O)
+        lines.append(f" {job_length} <= c_max <= {horizon}")
+        lines.append("Binaries")
+        lines.extend(f" {name}" for name in binaries)
+        lines.append("End")
+
+        # written next to its final name and then moved, so concurrent runs never read
+        # a half written file
+        tmp_path = lp_path.with_name(f"{lp_path.stem}.{os.getpid()}.tmp.lp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, lp_path)
+
+    def _create_model_bulk(self):
+        instance = self._instance
+        horizon = self._horizon()
+
+        if self._cache_dir is not None:
+            cache_dir = Path(self._cache_dir)
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            lp_path = cache_dir / f"fjssp_{self._model_key()}.lp"
+        else:
+            lp_path = Path(tempfile.mkdtemp()) / "fjssp.lp"
+
+        if lp_path.is_file():
+            yield f"model found in cache, check {lp_path}"
+        else:
+            # the cached model only uses the instance's horizon, the upper bound is
+            # applied to the variables after reading it
+            self._write_lp(lp_path=lp_path, horizon=horizon)
+            yield f"model written as lp file | horizon: {horizon}"
+
+        self.model = Model("FJSSP", solver_name=CBC)
+        self.model.verbose = 0
+        self.model.read(str(lp_path))
+
+        if self._cache_dir is None:
+            lp_path.unlink()
+            lp_path.parent.rmdir()
+
+        yield f"model read | vars: {self.model.num_cols} | constraints: {self.model.num_rows}"
+
+        variables = {var.name: var for var in self.model.vars}
+        self.x = {i: variables[f"x_{i}"] for i in instance.O}
+        self.z = {
+            (i, m): variables[f"z_{i}_{m}"] for i in instance.O for m in instance.M_i[i]
+        }
+        self.y = {
+            (i, j, m): variables[f"y_{i}_{j}_{m}"]
+            for m in instance.M
+            for i in instance.O_m[m]
+            for j in instance.O_m[m]
+            if i < j
+        }
+        self.c_max = variables["c_max"]
+
+        if self._upper_bound is not None and self._upper_bound < horizon:
+            # every latest start moves back by the same amount as the horizon
+            shift = horizon - self._upper_bound
+            self.c_max.ub = self._upper_bound
+            for var in self.x.values():
+                var.ub = var.ub - shift
+
+            yield f"variables bounded by the upper bound {self._upper_bound}\n"
+
     def optimize(
         self,
         *,
         verbose: int = 0,
         time_limit: int = 1800,
+        cutoff: float = None,
+        start: Solution = None,
     ) -> tuple:
         logger = self._logger
         feasible: bool
+        gap = None
 
         self.model.verbose = verbose if verbose in [0, 1] else 0
+        if cutoff is not None and cutoff < float("inf"):
+            # only solutions strictly better than the cutoff are searched for
+            self.model.cutoff = cutoff
+        if start is not None:
+            self.model.start = self._mip_start(solution=start)
+            logger.log(f"mip start from a solution with makespan {start._makespan}")
 
         timer = Crono()
         self._status = self.model.optimize(max_seconds=time_limit)
@@ -162,6 +455,7 @@ class MathModel:
 
             self._start_times = [self.x.get((op), 0).x for op in self._instance.O]
 
+            self._machine_scheduling = list()
             for machine in self._instance.M:
                 ops_in_m = list()
                 for op, m in enumerate(self._assign_vect):
@@ -190,6 +484,43 @@ class MathModel:
 
         return feasible, self._makespan, self._elapsed_time, gap
 
+    def _mip_start(self, *, solution: Solution) -> list:
+        # only the binaries set to 1 are given: the machine of every op (z) and, on every
+        # machine, which op of each pair comes first (y). cbc computes x and c_max itself
+        start = [(self.z[(op, m)], 1.0) for op, m in enumerate(solution._assign_vect.tolist())]
+
+        for m, sequence in enumerate(solution.machine_sequences()):
+            for k, i in enumerate(sequence):
+                for j in sequence[k + 1 :]:
+                    if i < j:
+                        start.append((self.y[(i, j, m)], 1.0))
+
+        return start
+
+    def result(self) -> dict:
+        return {
+            "makespan": self._makespan,
+            "assign_vect": list(self._assign_vect),
+            "start_times": list(self._start_times),
+            "machine_scheduling": [list(ops) for ops in self._machine_scheduling],
+            "elapsed_time": self._elapsed_time,
+        }
+
+    def load_result(self, result: dict) -> tuple:
+        self._makespan = result["makespan"]
+        self._assign_vect = result["assign_vect"]
+        self._start_times = result["start_times"]
+        self._machine_scheduling = result["machine_scheduling"]
+        self._elapsed_time = result["elapsed_time"]
+
+        feasible = self._makespan is not None
+        gap = (
+            evaluate_gap(ub=self._makespan, lb=self._instance.optimal_solution)
+            if feasible
+            else None
+        )
+        return feasible, self._makespan, self._elapsed_time, gap
+
     def _machine_of_op(self, *, op: int) -> int:
         for machine, ops in self._machine_scheduling:
             if op in ops:
@@ -198,20 +529,16 @@ class MathModel:
     def print(self, *, print_style: str = "array") -> None:
         logger = self._logger
 
-        if self.model.num_solutions:
-            makespan = self.c_max.x
+        if self._machine_scheduling:
+            makespan = self._makespan
 
             with logger:
                 logger.log(f"makespan: {makespan}")
 
                 if print_style == "each_op":
                     for i in self._instance.O:
-                        start = self.x[i].x
-                        machine = [
-                            m
-                            for m in self._instance.M_i[i]
-                            if self.z.get((i, m), 0).x >= 0.99
-                        ][0]
+                        start = self._start_times[i]
+                        machine = self._assign_vect[i]
 
                         logger.log(
                             f"operation: {i} | "
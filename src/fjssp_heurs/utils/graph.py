@@ -1,4 +1,6 @@
+import heapq
 import networkx as nx
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import matplotlib.patches as mpatches
@@ -10,61 +12,184 @@ from ..instance.instance import Instance
 from .crono import Crono
 
 
+# integer-indexed DAG backed by numpy arrays: operations keep their own ids and the
+# artificial nodes 'S' and 'V' sit at the fixed indices `source` and `sink`.
+# conjunctive arcs are stored in CSR form and consolidated disjunctive arcs in per-node
+# arrays, as an operation has at most one machine predecessor and one machine successor.
+# a networkx graph is only built when a drawing is requested
 class DAG:
     def __init__(self, instance: Instance):
         self._instance = instance
-        self._graph = nx.DiGraph()
+
+        num_ops = len(instance.O)
+        self.source = num_ops
+        self.sink = num_ops + 1
+        self.num_nodes = num_ops + 2
 
         self._positions = dict()
-        self._disjunctive_edges = dict()
 
         self._build_base_graph()
 
     def _build_base_graph(self):
         instance = self._instance
+        num_nodes = self.num_nodes
 
-        # adds nodes
-        for job, ops in instance.S_j.items():
-            for i, op in enumerate(ops):
-                self._add_operation(op=op, pos_x=i * 2, pos_y=job * 4)
+        from_nodes = list()
+        to_nodes = list()
 
-        # adds edges
+        # adds technological edges
         for job in instance.P_j:
             for _from, _to in job:
-                self._add_dependency(from_node=_from, to_node=_to)
+                from_nodes.append(_from)
+                to_nodes.append(_to)
 
-        # adds nodes & edges for artificial nodes 'S' and 'T'
-        self._add_artificial_nodes()
+        # adds edges for artificial nodes 'S' and 'V'
+        for ops in instance.S_j.values():
+            from_nodes.extend((self.source, ops[-1]))
+            to_nodes.extend((ops[0], self.sink))
 
-    def set_edge_weight(self, from_node: int, to_node: int, weight: float):
-        if self._graph.has_edge(from_node, to_node):
-            self._graph[from_node][to_node]["weight"] = weight
-        else:
-            print(f"edge ({from_node}, {to_node}) not in graph.edges")
+        from_nodes = np.array(from_nodes, dtype=np.int32)
+        to_nodes = np.array(to_nodes, dtype=np.int32)
 
-    def _add_operation(self, *, op: int, pos_x: float, pos_y: float):
-        self._graph.add_node(op)
-        self._positions[op] = (pos_x, -pos_y)
+        arc_order = np.argsort(from_nodes, kind="stable")
+        self._arc_from = from_nodes[arc_order]
+        self._arc_to = to_nodes[arc_order]
+        self._arc_weight = np.zeros(len(arc_order), dtype=np.float64)
 
-    def _add_dependency(self, *, from_node: int, to_node: int, weight=0):
-        self._graph.add_edge(from_node, to_node, weight=weight)
+        self._succ_ptr = np.zeros(num_nodes + 1, dtype=np.int32)
+        np.cumsum(
+            np.bincount(self._arc_from, minlength=num_nodes), out=self._succ_ptr[1:]
+        )
 
-    def _add_artificial_nodes(self):
-        instance = self._instance
-        y_values = range(instance.num_jobs)
-        center_y = 0 if not y_values else -y_values[len(y_values) // 2]
+        self._pred_arc = np.argsort(self._arc_to, kind="stable").astype(np.int32)
+        self._pred_ptr = np.zeros(num_nodes + 1, dtype=np.int32)
+        np.cumsum(
+            np.bincount(self._arc_to, minlength=num_nodes), out=self._pred_ptr[1:]
+        )
 
-        self._graph.add_node("S")
-        self._graph.add_node("V")
+        # the arc structure never changes, so copies of this DAG share it
+        for structure in (
+            self._arc_from,
+            self._arc_to,
+            self._succ_ptr,
+            self._pred_arc,
+            self._pred_ptr,
+        ):
+            structure.flags.writeable = False
+
+        self._reset_disjunctives()
+
+    def _reset_disjunctives(self):
+        num_nodes = self.num_nodes
+        self._disj_succ = np.full(num_nodes, -1, dtype=np.int32)
+        self._disj_pred = np.full(num_nodes, -1, dtype=np.int32)
+        self._disj_weight = np.zeros(num_nodes, dtype=np.float64)
+        self._disjunctive_edges = dict()
+        self._disjunctive_cliques = dict()
+
+    def copy_conjunctives(self) -> "DAG":
+        dag = DAG.__new__(DAG)
+        dag._instance = self._instance
+        dag.source = self.source
+        dag.sink = self.sink
+        dag.num_nodes = self.num_nodes
+        dag._positions = self._positions
+
+        dag._arc_from = self._arc_from
+        dag._arc_to = self._arc_to
+        dag._succ_ptr = self._succ_ptr
+        dag._pred_arc = self._pred_arc
+        dag._pred_ptr = self._pred_ptr
+        dag._arc_weight = self._arc_weight.copy()
+
+        dag._reset_disjunctives()
+        return dag
+
+    def copy(self) -> "DAG":
+        dag = self.copy_conjunctives()
+
+        dag._disj_succ = self._disj_succ.copy()
+        dag._disj_pred = self._disj_pred.copy()
+        dag._disj_weight = self._disj_weight.copy()
+        dag._disjunctive_edges = {
+            machine: list(edges) for machine, edges in self._disjunctive_edges.items()
+        }
+        dag._disjunctive_cliques = dict(self._disjunctive_cliques)
+
+        return dag
+
+    def _find_arc(self, from_node: int, to_node: int) -> int:
+        for arc in range(self._succ_ptr[from_node], self._succ_ptr[from_node + 1]):
+            if self._arc_to[arc] == to_node:
+                return arc
+        return -1
+
+    def has_edge(self, from_node: int, to_node: int) -> bool:
+        return (
+            self._disj_succ[from_node] == to_node
+            or self._find_arc(from_node, to_node) >= 0
+        )
 
-        min_x = min(pos[0] for pos in self._positions.values())
-        max_x = max(pos[0] for pos in self._positions.values())
-        self._positions["S"] = (min_x - 1, center_y)
-        self._positions["V"] = (max_x + 1, center_y)
+    def set_edge_weight(self, from_node: int, to_node: int, weight: float):
+        arc = self._find_arc(from_node, to_node)
+        if arc >= 0:
+            self._arc_weight[arc] = weight
+        elif self._disj_succ[from_node] == to_node:
+            self._disj_weight[from_node] = weight
+        else:
+            print(f"edge ({from_node}, {to_node}) not in graph.edges")
 
-        for ops in instance.S_j.values():
-            self._add_dependency(from_node="S", to_node=ops[0])
-            self._add_dependency(from_node=ops[-1], to_node="V")
+    def set_operations_weights(self, weights: np.ndarray):
+        # every outgoing conjunctive arc of an operation weights its processing time
+        num_ops = self.source
+        out_degree = np.diff(self._succ_ptr[: num_ops + 1])
+        self._arc_weight[: self._succ_ptr[num_ops]] = np.repeat(weights, out_degree)
+
+    def set_operation_weight(self, op: int, weight: float):
+        self._arc_weight[self._succ_ptr[op] : self._succ_ptr[op + 1]] = weight
+
+    def successors(self, node: int) -> list[tuple[int, float]]:
+        start, end = self._succ_ptr[node], self._succ_ptr[node + 1]
+        arcs = list(
+            zip(self._arc_to[start:end].tolist(), self._arc_weight[start:end].tolist())
+        )
+        if self._disj_succ[node] >= 0:
+            arcs.append((int(self._disj_succ[node]), float(self._disj_weight[node])))
+        return arcs
+
+    def predecessors(self, node: int) -> list[tuple[int, float]]:
+        pred_arcs = self._pred_arc[self._pred_ptr[node] : self._pred_ptr[node + 1]]
+        arcs = list(
+            zip(self._arc_from[pred_arcs].tolist(), self._arc_weight[pred_arcs].tolist())
+        )
+        pred = self._disj_pred[node]
+        if pred >= 0:
+            arcs.append((int(pred), float(self._disj_weight[pred])))
+        return arcs
+
+    def topological_order(self) -> list[int]:
+        in_degree = (np.diff(self._pred_ptr) + (self._disj_pred >= 0)).tolist()
+        arc_to = self._arc_to.tolist()
+        succ_ptr = self._succ_ptr.tolist()
+        disj_succ = self._disj_succ.tolist()
+
+        stack = [node for node in range(self.num_nodes) if in_degree[node] == 0]
+        order = list()
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            succs = arc_to[succ_ptr[node] : succ_ptr[node + 1]]
+            if disj_succ[node] >= 0:
+                succs.append(disj_succ[node])
+            for succ in succs:
+                in_degree[succ] -= 1
+                if in_degree[succ] == 0:
+                    stack.append(succ)
+
+        if len(order) < self.num_nodes:
+            raise ValueError("the graph contains a cycle")
+
+        return order
 
     def add_disjunctive_edge(
         self,
@@ -75,9 +200,106 @@ class DAG:
         consolidated: bool = True,
     ):
         if consolidated:
-            self._graph.add_edge(from_node, to_node, weight=weight)
+            if self._disj_succ[from_node] not in (-1, to_node) or self._disj_pred[
+                to_node
+            ] not in (-1, from_node):
+                raise ValueError(
+                    f"disjunctive edge ({from_node}, {to_node}) conflicts with an "
+                    "already consolidated machine sequence"
+                )
+            self._disj_succ[from_node] = to_node
+            self._disj_pred[to_node] = from_node
+            self._disj_weight[from_node] = weight
         self._disjunctive_edges.setdefault(machine, []).append((from_node, to_node))
 
+    def add_disjunctive_clique(
+        self, machine: int, ops: list[int], tech_disjunc: bool = True
+    ):
+        # unconsolidated machines are kept as their op set, the pairwise disjunctive
+        # edges are only enumerated when the graph is drawn
+        self._disjunctive_cliques[machine] = (ops, tech_disjunc)
+
+    def _visual_disjunctive_edges(self) -> dict[int, list[tuple[int, int]]]:
+        job_of_op = self._instance.job_of_op
+
+        visual_edges = dict()
+        for machine, (ops, tech_disjunc) in self._disjunctive_cliques.items():
+            edges = [
+                (op1, op2)
+                for op1, op2 in combinations(ops, 2)
+                if tech_disjunc or job_of_op[op1] != job_of_op[op2]
+            ]
+            if edges:
+                visual_edges[machine] = edges
+
+        for machine, edges in self._disjunctive_edges.items():
+            visual_edges.setdefault(machine, []).extend(edges)
+
+        return visual_edges
+
+    def remove_disjunctive_edge(self, machine: int, from_node: int, to_node: int):
+        if self._disj_succ[from_node] != to_node:
+            raise ValueError(f"edge ({from_node}, {to_node}) not in graph.edges")
+
+        self._disj_succ[from_node] = -1
+        self._disj_pred[to_node] = -1
+        self._disj_weight[from_node] = 0.0
+
+        edges_in_machine = self._disjunctive_edges.get(machine, [])
+        if (from_node, to_node) in edges_in_machine:
+            edges_in_machine.remove((from_node, to_node))
+
+    def _node_label(self, node: int):
+        if node == self.source:
+            return "S"
+        if node == self.sink:
+            return "V"
+        return node
+
+    def _layout(self) -> dict:
+        if self._positions:
+            return self._positions
+
+        instance = self._instance
+        for job, ops in instance.S_j.items():
+            for i, op in enumerate(ops):
+                self._positions[op] = (i * 2, -job * 4)
+
+        y_values = range(instance.num_jobs)
+        center_y = 0 if not y_values else -y_values[len(y_values) // 2]
+        min_x = min(pos[0] for pos in self._positions.values())
+        max_x = max(pos[0] for pos in self._positions.values())
+        self._positions["S"] = (min_x - 1, center_y)
+        self._positions["V"] = (max_x + 1, center_y)
+
+        return self._positions
+
+    def to_networkx(self) -> nx.DiGraph:
+        def _weight(value: float):
+            return int(value) if float(value).is_integer() else float(value)
+
+        graph = nx.DiGraph()
+
+        for ops in self._instance.S_j.values():
+            graph.add_nodes_from(ops)
+        graph.add_nodes_from(["S", "V"])
+
+        for _from, _to, weight in zip(
+            self._arc_from.tolist(), self._arc_to.tolist(), self._arc_weight.tolist()
+        ):
+            graph.add_edge(
+                self._node_label(_from), self._node_label(_to), weight=_weight(weight)
+            )
+
+        for _from in np.flatnonzero(self._disj_succ >= 0).tolist():
+            graph.add_edge(
+                _from,
+                int(self._disj_succ[_from]),
+                weight=_weight(self._disj_weight[_from]),
+            )
+
+        return graph
+
     def draw(
         self,
         *,
@@ -90,14 +312,18 @@ class DAG:
     ):
         timer = Crono()
 
+        graph = self.to_networkx()
+        positions = self._layout()
+        disjunctive_edges = self._visual_disjunctive_edges()
+
         try:
             plt.figure(figsize=(16, 10))
 
             nx.draw_networkx_nodes(
-                self._graph, pos=self._positions, node_color="lightblue", node_size=300
+                graph, pos=positions, node_color="lightblue", node_size=300
             )
             nx.draw_networkx_labels(
-                self._graph, pos=self._positions, font_size=10, font_weight="bold"
+                graph, pos=positions, font_size=10, font_weight="bold"
             )
 
             if timer.elapsed_time() > time_limit:
@@ -106,7 +332,7 @@ class DAG:
             if not show_real_disjunct:
                 added_disjunctive_edges = [
                     edge
-                    for edges_in_machine in self._disjunctive_edges.values()
+                    for edges_in_machine in disjunctive_edges.values()
                     for edge in edges_in_machine
                 ]
                 all_tech_edges = [
@@ -119,14 +345,14 @@ class DAG:
                     if edge not in all_tech_edges
                 ]
                 showing_edges = [
-                    e for e in self._graph.edges if e not in unwanted_edges
+                    e for e in graph.edges if e not in unwanted_edges
                 ]
             else:
-                showing_edges = self._graph.edges
+                showing_edges = graph.edges
 
             nx.draw_networkx_edges(
-                self._graph,
-                pos=self._positions,
+                graph,
+                pos=positions,
                 edgelist=showing_edges,
                 edge_color="black",
                 arrows=True,
@@ -137,11 +363,11 @@ class DAG:
                 raise TimeoutError("time exceeded in creating the edges")
 
             edge_labels = {
-                (u, v): self._graph[u][v]["weight"] for u, v in showing_edges
+                (u, v): graph[u][v]["weight"] for u, v in showing_edges
             }
             nx.draw_networkx_edge_labels(
-                self._graph,
-                pos=self._positions,
+                graph,
+                pos=positions,
                 edge_labels=edge_labels,
                 font_color="red",
                 font_size=8,
@@ -152,7 +378,7 @@ class DAG:
 
             if show_visual_disjunct:
                 color_map = cm.get_cmap("tab10")
-                machines = list(self._disjunctive_edges.keys())
+                machines = list(disjunctive_edges.keys())
                 n_colors = len(machines)
 
                 for i, machine in enumerate(machines):
@@ -162,15 +388,15 @@ class DAG:
                         )
 
                     color = color_map(i / max(n_colors - 1, 1))
-                    arcs = self._disjunctive_edges[machine]
+                    arcs = disjunctive_edges[machine]
                     rad = 0.2 + (i % 3) * 0.1
                     mult = 1
 
                     for edge in arcs:
                         edge_rad = rad * 1.3 * mult
                         nx.draw_networkx_edges(
-                            self._graph,
-                            pos=self._positions,
+                            graph,
+                            pos=positions,
                             edgelist=[edge],
                             edge_color=[color],
                             style="dashed",
@@ -255,6 +481,8 @@ class FJSSPGraph:
             return None
 
         self._instance = instance
+        self._op_machine = None
+        self._reset_timing()
 
         if graph_type == "fjssp instance":
             self._machines_assignment = [
@@ -277,19 +505,19 @@ class FJSSPGraph:
         self._dag = DAG(instance)
 
         if graph_type in ["partial fjssp", "complete fjssp"]:
-            ops_machine = {
-                op: m
-                for op in self._instance.O
-                for m, ops in enumerate(self._machines_assignment)
-                if op in ops
-            }
-            for u, v in self._dag._graph.edges:
-                if u != "S":
-                    self._dag.set_edge_weight(
-                        from_node=u,
-                        to_node=v,
-                        weight=self._instance.p[(u, ops_machine[u])],
-                    )
+            self._op_machine = np.full(len(self._instance.O), -1, dtype=np.int32)
+            for m, ops in enumerate(self._machines_assignment):
+                for op in ops:
+                    self._op_machine[op] = m
+            self._dag.set_operations_weights(
+                np.array(
+                    [
+                        self._instance.p[(op, m)]
+                        for op, m in enumerate(self._op_machine.tolist())
+                    ],
+                    dtype=np.float64,
+                )
+            )
 
         self._create_disjunctives(tech_disjunc=tech_disjunc, graph_type=graph_type)
 
@@ -313,16 +541,9 @@ class FJSSPGraph:
 
         if graph_type in ["fjssp instance", "partial fjssp"]:
             for machine, ops in enumerate(self._machines_assignment):
-                for op1, op2 in combinations(ops, 2):
-                    if tech_disjunc or (
-                        self._instance.job_of_op[op1] != self._instance.job_of_op[op2]
-                    ):
-                        self._dag.add_disjunctive_edge(
-                            machine,
-                            op1,
-                            op2,
-                            consolidated=False,
-                        )
+                self._dag.add_disjunctive_clique(
+                    machine, ops, tech_disjunc=tech_disjunc
+                )
 
     """
     def _set_edge_weights(self):
@@ -352,16 +573,79 @@ class FJSSPGraph:
                 self._dag.set_edge_weight(u, v, 0)
     """
 
+    def copy(self) -> "FJSSPGraph":
+        graph = FJSSPGraph.__new__(FJSSPGraph)
+        graph._instance = self._instance
+        graph._dag = self._dag.copy()
+        graph._op_machine = (
+            None if self._op_machine is None else self._op_machine.copy()
+        )
+        graph._machines_assignment = list(self._machines_assignment)
+        graph._machines_scheduling = list(self._machines_scheduling)
+
+        graph._reset_timing()
+        if self._timing_valid:
+            graph._timing_valid = True
+            graph._topo_order = list(self._topo_order)
+            graph._topo_pos = list(self._topo_pos)
+            graph._heads = self._heads.copy()
+            graph._tails = self._tails.copy()
+            graph._dirty_heads = set(self._dirty_heads)
+            graph._dirty_tails = set(self._dirty_tails)
+
+        return graph
+
+    def apply_moves(
+        self, moves: list[tuple[int, int]], *, tech_disjunc: bool = False
+    ) -> "FJSSPGraph":
+        # builds the 'partial fjssp' graph of a neighbor that differs from this graph
+        # by a few (op, new_machine) moves: the DAG structure is shared, weights and
+        # machine memberships are copied on write and only moved operations are touched
+        if self._op_machine is None:
+            raise ValueError("moves can only be applied on an assigned FJSSPGraph")
+
+        instance = self._instance
+
+        graph = FJSSPGraph.__new__(FJSSPGraph)
+        graph._instance = instance
+        graph._reset_timing()
+        graph._op_machine = self._op_machine.copy()
+        graph._machines_assignment = list(self._machines_assignment)
+        graph._dag = self._dag.copy_conjunctives()
+
+        copied_machines = set()
+        for op, new_machine in moves:
+            old_machine = int(graph._op_machine[op])
+            if old_machine == new_machine:
+                continue
+
+            for machine in (old_machine, new_machine):
+                if machine not in copied_machines:
+                    graph._machines_assignment[machine] = set(
+                        graph._machines_assignment[machine]
+                    )
+                    copied_machines.add(machine)
+
+            graph._machines_assignment[old_machine].discard(op)
+            graph._machines_assignment[new_machine].add(op)
+            graph._op_machine[op] = new_machine
+            graph._dag.set_operation_weight(op, instance.p[(op, new_machine)])
+
+        graph._machines_scheduling = graph._machines_assignment.copy()
+        graph._create_disjunctives(
+            tech_disjunc=tech_disjunc, graph_type="partial fjssp"
+        )
+
+        return graph
+
     def _are_sequence_consolidated(self, machine_id: int) -> bool:
         if not self._machines_scheduling[machine_id]:
             return False
 
-        scheduling = self._machines_scheduling[machine_id]
+        scheduling = list(self._machines_scheduling[machine_id])
 
-        for i in range(len(scheduling) - 1):
-            from_op = list(scheduling)[i]
-            to_op = list(scheduling)[i + 1]
-            if (from_op, to_op) not in self._dag._graph.edges:
+        for from_op, to_op in zip(scheduling[:-1], scheduling[1:]):
+            if not self._dag.has_edge(from_op, to_op):
                 return False
 
         return True
@@ -381,29 +665,186 @@ class FJSSPGraph:
                     weight=self._instance.p[(from_op, machine_id)],
                     consolidated=True,
                 )
+                self._arc_added(from_op, to_op)
 
     def remove_sequence_on_machine(self, *, machine_id: int) -> None:
         if self._machines_scheduling[machine_id]:
-            sequence = self._machines_scheduling[machine_id]
-            for i in range(len(sequence) - 1):
-                from_op = list(sequence)[i]
-                to_op = list(sequence)[i + 1]
+            sequence = list(self._machines_scheduling[machine_id])
+            for from_op, to_op in zip(sequence[:-1], sequence[1:]):
                 if self._instance.job_of_op[from_op] != self._instance.job_of_op[to_op]:
-                    self._dag._graph.remove_edge(
-                        from_op,
-                        to_op,
+                    self._dag.remove_disjunctive_edge(
+                        machine=machine_id, from_node=from_op, to_node=to_op
                     )
+                    self._arc_removed(from_op, to_op)
         self._machines_scheduling[machine_id] = list()
 
+    def _reset_timing(self) -> None:
+        self._timing_valid = False
+        self._topo_order = list()
+        self._topo_pos = list()
+        self._heads = None
+        self._tails = None
+        self._dirty_heads = set()
+        self._dirty_tails = set()
+
+    # heads (release dates) and tails (delivery times) are cached after the first
+    # full sweep; arc changes only mark their endpoints dirty and the affected
+    # cone is repaired lazily, in topological order, on the next query
+    def _arc_added(self, from_node: int, to_node: int) -> None:
+        if not self._timing_valid:
+            return
+
+        if self._topo_pos[from_node] > self._topo_pos[to_node]:
+            self._reorder_topological(from_node, to_node)
+
+        self._dirty_heads.add(to_node)
+        self._dirty_tails.add(from_node)
+
+    def _arc_removed(self, from_node: int, to_node: int) -> None:
+        if not self._timing_valid:
+            return
+
+        self._dirty_heads.add(to_node)
+        self._dirty_tails.add(from_node)
+
+    def _reorder_topological(self, from_node: int, to_node: int) -> None:
+        # pearce-kelly: only the nodes between the arc endpoints in the current
+        # order are visited and shuffled
+        dag = self._dag
+        topo_pos = self._topo_pos
+        lower, upper = topo_pos[to_node], topo_pos[from_node]
+
+        forward = set()
+        stack = [to_node]
+        while stack:
+            node = stack.pop()
+            if node in forward:
+                continue
+            if node == from_node:
+                raise ValueError(
+                    f"arc ({from_node}, {to_node}) creates a cycle in the graph"
+                )
+            forward.add(node)
+            stack.extend(
+                succ
+                for succ, _ in dag.successors(node)
+                if topo_pos[succ] <= upper and succ not in forward
+            )
+
+        backward = set()
+        stack = [from_node]
+        while stack:
+            node = stack.pop()
+            if node in backward:
+                continue
+            backward.add(node)
+            stack.extend(
+                pred
+                for pred, _ in dag.predecessors(node)
+                if topo_pos[pred] >= lower and pred not in backward
+            )
+
+        moved = sorted(backward, key=topo_pos.__getitem__) + sorted(
+            forward, key=topo_pos.__getitem__
+        )
+        slots = sorted(topo_pos[node] for node in moved)
+
+        for slot, node in zip(slots, moved):
+            topo_pos[node] = slot
+            self._topo_order[slot] = node
+
+    def _recompute_timing(self) -> None:
+        dag = self._dag
+        order = dag.topological_order()
+
+        heads = [0.0] * dag.num_nodes
+        tails = [0.0] * dag.num_nodes
+        successors = [dag.successors(node) for node in range(dag.num_nodes)]
+
+        for u in order:
+            head_u = heads[u]
+            for v, weight in successors[u]:
+                if head_u + weight > heads[v]:
+                    heads[v] = head_u + weight
+
+        for u in reversed(order):
+            tail_u = tails[u]
+            for v, weight in successors[u]:
+                if weight + tails[v] > tail_u:
+                    tail_u = weight + tails[v]
+            tails[u] = tail_u
+
+        topo_pos = [0] * dag.num_nodes
+        for i, node in enumerate(order):
+            topo_pos[node] = i
+
+        self._topo_order = order
+        self._topo_pos = topo_pos
+        self._heads = np.array(heads, dtype=np.float64)
+        self._tails = np.array(tails, dtype=np.float64)
+        self._dirty_heads.clear()
+        self._dirty_tails.clear()
+        self._timing_valid = True
+
+    def _repair_timing(self) -> None:
+        dag = self._dag
+        topo_pos = self._topo_pos
+
+        heads = self._heads
+        queue = [(topo_pos[node], node) for node in self._dirty_heads]
+        queued = set(self._dirty_heads)
+        heapq.heapify(queue)
+        while queue:
+            _, node = heapq.heappop(queue)
+            queued.discard(node)
+            head = max(
+                (heads[u] + weight for u, weight in dag.predecessors(node)),
+                default=0.0,
+            )
+            if head != heads[node]:
+                heads[node] = head
+                for v, _ in dag.successors(node):
+                    if v not in queued:
+                        queued.add(v)
+                        heapq.heappush(queue, (topo_pos[v], v))
+
+        tails = self._tails
+        queue = [(-topo_pos[node], node) for node in self._dirty_tails]
+        queued = set(self._dirty_tails)
+        heapq.heapify(queue)
+        while queue:
+            _, node = heapq.heappop(queue)
+            queued.discard(node)
+            tail = max(
+                (weight + tails[v] for v, weight in dag.successors(node)),
+                default=0.0,
+            )
+            if tail != tails[node]:
+                tails[node] = tail
+                for u, _ in dag.predecessors(node):
+                    if u not in queued:
+                        queued.add(u)
+                        heapq.heappush(queue, (-topo_pos[u], u))
+
+        self._dirty_heads.clear()
+        self._dirty_tails.clear()
+
+    def heads_and_tails(self) -> tuple[np.ndarray, np.ndarray]:
+        if not self._timing_valid:
+            self._recompute_timing()
+        elif self._dirty_heads or self._dirty_tails:
+            self._repair_timing()
+
+        num_ops = len(self._instance.O)
+        return self._heads[:num_ops].copy(), self._tails[:num_ops].copy()
+
     def longest_path_to(self, op: int) -> float:
-        subgraph = self._dag._graph.subgraph(nx.ancestors(self._dag._graph, op) | {op})
-        return nx.dag_longest_path_length(subgraph, weight="weight")
+        heads, _ = self.heads_and_tails()
+        return float(heads[op])
 
     def longest_path_from(self, op: int) -> float:
-        subgraph = self._dag._graph.subgraph(
-            nx.descendants(self._dag._graph, op) | {op}
-        )
-        return nx.dag_longest_path_length(subgraph, weight="weight")
+        _, tails = self.heads_and_tails()
+        return float(tails[op])
 
     def export_visualization(
         self,
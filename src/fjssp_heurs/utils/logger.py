@@ -1,52 +1,176 @@
 from pathlib import Path
 import sys
+import json
+import time
+import weakref
+import atexit
 import datetime
 
 
+# loggers with an open file. they are flushed once at exit, without keeping closed or
+# dropped loggers alive
+_open_loggers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_loggers():
+    for logger in list(_open_loggers):
+        logger.flush()
+
+
 class LOGGER:
-    def __init__(self, log_path: Path, indent_str="    ", out: str = "both"):
+    def __init__(
+        self,
+        log_path: Path,
+        indent_str="    ",
+        out: str = "both",
+        buffer_lines: int = 1,
+        flush_interval: float = 1.0,
+        events_path: Path = None,
+    ):
         self._log_path = log_path
-        self.level = 0
         self.indent_str = indent_str
+        self.level = 0
         self._log_file = None
+        self._events_file = None
         self._out = out if out in ["terminal", "file", "both"] else None
         self.on = 1 if out in ["terminal", "both"] else -1
 
-        try:
-            self._log_file = open(self._log_path, "w", encoding="utf-8")
+        # lines are kept in memory and written in a single call once 'buffer_lines' are
+        # pending, or on the next write after 'flush_interval' seconds without one.
+        # copies of a logger share these lists, so their lines keep the order they were
+        # logged
+        self.buffer_lines = buffer_lines
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._pending_terminal = []
+        self._pending_file = []
+        self._pending_events = []
+
+        if self._out in ["file", "both"]:
+            try:
+                self._log_file = open(self._log_path, "w", encoding="utf-8")
+
+                self._log_file.write("\n" * 5)
+                self._log_file.write(f"{datetime.datetime.now()}\n")
+                self._log_file.write("\n" * 5)
+            except IOError as e:
+                print(
+                    f"error opening log file: '{self._log_path}': {e}",
+                    file=sys.stderr,
+                )
+                self.on = -1
+
+        if events_path is not None:
+            try:
+                self._events_file = open(events_path, "w", encoding="utf-8")
+            except IOError as e:
+                print(
+                    f"error opening events file: '{events_path}': {e}",
+                    file=sys.stderr,
+                )
+
+        self._update_enabled()
+
+        if self._log_file is not None or self._events_file is not None:
+            _open_loggers.add(self)
+
+    @property
+    def events_enabled(self) -> bool:
+        return self._events_file is not None
+
+    def _update_enabled(self):
+        # whether a log call can produce any output at all. hot code paths check it
+        # before formatting their messages, so disabled logging costs nothing
+        self.enabled = (self._log_file is not None) or (
+            self._out in ["terminal", "both"] and self.on == 1
+        )
+
+    def _write(self, text: str):
+        if self._out in ["terminal", "both"] and self.on == 1:
+            self._pending_terminal.append(text)
+        if self._log_file is not None:
+            self._pending_file.append(text)
+
+        self._maybe_flush()
 
-            self._log_file.write("\n" * 5)
-            self._log_file.write(f"{datetime.datetime.now()}\n")
-            self._log_file.write("\n" * 5)
-        except IOError as e:
-            print(
-                f"error opening log file: '{self._log_path}': {e}",
-                file=sys.stderr,
-            )
-            self.on = -1
+    def _maybe_flush(self):
+        pending = (
+            len(self._pending_terminal)
+            + len(self._pending_file)
+            + len(self._pending_events)
+        )
+        if (
+            pending >= self.buffer_lines
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+
+        if self._pending_terminal:
+            sys.stdout.write("".join(self._pending_terminal))
+            sys.stdout.flush()
+            self._pending_terminal.clear()
+
+        if self._pending_file:
+            try:
+                self._log_file.write("".join(self._pending_file))
+                self._log_file.flush()
+            except (IOError, ValueError) as e:
+                print(f"error on writing log on file: {e}", file=sys.stderr)
+                self.on = -1
+            self._pending_file.clear()
+
+        if self._pending_events:
+            try:
+                self._events_file.write("".join(self._pending_events))
+                self._events_file.flush()
+            except (IOError, ValueError) as e:
+                print(f"error on writing events on file: {e}", file=sys.stderr)
+            self._pending_events.clear()
+
+    def close(self):
+        # flushes the pending lines and closes the files; later calls log nothing to them
+        self.flush()
+
+        for file in [self._log_file, self._events_file]:
+            if file is not None:
+                file.close()
+        self._log_file = None
+        self._events_file = None
+
+        _open_loggers.discard(self)
+        self._update_enabled()
 
     def log(self, message):
-        msg = f"{self.indent_str * self.level}> {message}"
-        if self._out in ["terminal", "both"]:
-            if self.on == 1:
-                print(msg)
-        if self._out in ["file", "both"]:
-            if self._log_file:
-                try:
-                    self._log_file.write(msg + "\n")
-                except IOError as e:
-                    print(f"error on writing log on file: {e}", file=sys.stderr)
-                    self.on = -1
+        if not self.enabled:
+            return
+
+        if callable(message):
+            message = message()
+
+        self._write(f"{self.indent_str * self.level}> {message}\n")
+
+    def event(self, **fields):
+        # structured record for the JSON-lines sink, one object per line
+        if self._events_file is None:
+            return
+
+        self._pending_events.append(json.dumps(fields) + "\n")
+        self._maybe_flush()
 
     def breakline(self, n: int = 1):
-        if self.on == 1 and self._out in ["both", "terminal"]:
-            print("\n" * (n - 1))
-        if self._out in ["file", "both"]:
-            for _ in range(n):
-                self._log_file.write("\n")
+        if not self.enabled:
+            return
+
+        self._write("\n" * n)
 
     def switch_on_off(self):
+        self.flush()
         self.on *= -1
+        self._update_enabled()
 
     def __enter__(self):
         self.level += 1
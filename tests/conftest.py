@@ -0,0 +1,82 @@
+from pathlib import Path
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+# the package is imported from the repository root, as main.py does
+sys.path.insert(0, str(ROOT))
+
+from src.fjssp_heurs.instance.instance import Instance  # noqa: E402
+from src.fjssp_heurs.utils.logger import LOGGER  # noqa: E402
+from src.fjssp_heurs.processing.metaheuristic.solution import Solution  # noqa: E402
+from src.fjssp_heurs.processing.metaheuristic.solbuilder import (  # noqa: E402
+    SolutionBuilder,
+)
+
+INSTANCES = ["kacem/k1", "kacem/k2", "kacem/k4", "barnes/mt10c1"]
+
+
+def load_instance(name: str) -> Instance:
+    return Instance(ROOT / "files" / "instances" / f"{name}.txt")
+
+
+def build_solution(
+    instance: Instance, logger: LOGGER, seed: int = 42, approach: str = "grasp"
+) -> Solution:
+    solution = Solution(instance=instance, logger=logger)
+    builder = SolutionBuilder(logger=logger, seed=seed)
+    builder.define_hiperparams(alpha_grasp=0.35)
+    if approach == "grasp":
+        np.random.seed(seed)
+        builder.build_solution(
+            solution=solution,
+            machines_strategy="grasp",
+            scheduler_approach="machine_by_machine",
+        )
+    else:
+        builder.build_best_solution(solution=solution, scheduler_approach=approach)
+    return solution
+
+
+def assert_feasible(solution: Solution) -> None:
+    # every op runs on an eligible machine for its processing time, after its job
+    # predecessor and without overlapping the ops of its machine sequence
+    instance = solution._instance
+    start_times = solution._start_times
+    finish_times = solution._finish_times
+
+    for op in instance.O:
+        machine = int(solution._assign_vect[op])
+        assert machine in instance.M_i[op]
+        assert start_times[op] >= 0
+        assert finish_times[op] == pytest.approx(
+            start_times[op] + instance.p[(op, machine)]
+        )
+
+    for ops in instance.S_j.values():
+        for prev_op, op in zip(ops[:-1], ops[1:]):
+            assert start_times[op] >= finish_times[prev_op] - 1e-9
+
+    sequences = solution.machine_sequences()
+    assert sorted(op for sequence in sequences for op in sequence) == list(instance.O)
+    for machine, sequence in enumerate(sequences):
+        for op in sequence:
+            assert solution._assign_vect[op] == machine
+        for prev_op, op in zip(sequence[:-1], sequence[1:]):
+            assert start_times[op] >= finish_times[prev_op] - 1e-9
+
+    assert solution._makespan == pytest.approx(finish_times.max())
+
+
+@pytest.fixture
+def logger() -> LOGGER:
+    return LOGGER(log_path=os.devnull, out="off")
+
+
+@pytest.fixture(autouse=True)
+def _work_in_root(monkeypatch):
+    # instances look their known optimum up relative to the repository root
+    monkeypatch.chdir(ROOT)
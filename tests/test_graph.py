@@ -0,0 +1,116 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from src.fjssp_heurs.utils.graph import FJSSPGraph
+
+from conftest import INSTANCES, build_solution, load_instance
+
+
+def _networkx_heads_and_tails(graph: FJSSPGraph) -> tuple[np.ndarray, np.ndarray]:
+    # reference longest paths from 'S' to every op and from every op to 'V'
+    nx_graph = graph._dag.to_networkx()
+    num_ops = len(graph._instance.O)
+
+    heads = np.zeros(num_ops)
+    tails = np.zeros(num_ops)
+    for op in range(num_ops):
+        heads[op] = nx.dag_longest_path_length(
+            nx_graph.subgraph(nx.ancestors(nx_graph, op) | {op})
+        )
+        tails[op] = nx.dag_longest_path_length(
+            nx_graph.subgraph(nx.descendants(nx_graph, op) | {op})
+        )
+    return heads, tails
+
+
+def _complete_graph(solution) -> FJSSPGraph:
+    return FJSSPGraph(
+        instance=solution._instance,
+        machines_assignment=solution.machine_sequences(),
+        tech_disjunc=True,
+        graph_type="complete fjssp",
+    )
+
+
+def _assert_timing_matches_networkx(graph: FJSSPGraph) -> None:
+    heads, tails = graph.heads_and_tails()
+    expected_heads, expected_tails = _networkx_heads_and_tails(graph)
+    np.testing.assert_allclose(heads, expected_heads)
+    np.testing.assert_allclose(tails, expected_tails)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_complete_graph_heads_and_tails_match_networkx(name, logger):
+    solution = build_solution(load_instance(name), logger)
+    graph = _complete_graph(solution)
+
+    _assert_timing_matches_networkx(graph)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_complete_graph_heads_are_the_schedule_start_times(name, logger):
+    solution = build_solution(load_instance(name), logger)
+    graph = _complete_graph(solution)
+
+    heads, _ = graph.heads_and_tails()
+    # the constructive schedule is semi-active: no op can start earlier
+    np.testing.assert_allclose(heads, solution._start_times)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_incremental_timing_matches_networkx(name, logger):
+    solution = build_solution(load_instance(name), logger)
+    sequences = solution.machine_sequences()
+    graph = FJSSPGraph(
+        instance=solution._instance,
+        machines_assignment=sequences,
+        tech_disjunc=False,
+        graph_type="partial fjssp",
+    )
+    # a first query caches the timing, the next ones repair it incrementally
+    _assert_timing_matches_networkx(graph)
+
+    for machine, sequence in enumerate(sequences):
+        graph.consolidate_sequence_on_machine(machine_id=machine, sequence=sequence)
+        _assert_timing_matches_networkx(graph)
+
+    for machine in range(len(sequences)):
+        graph.remove_sequence_on_machine(machine_id=machine)
+        _assert_timing_matches_networkx(graph)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_apply_moves_matches_a_rebuilt_graph(name, logger):
+    instance = load_instance(name)
+    solution = build_solution(instance, logger)
+    solution.create_graph(tech_disjunc=False, graph_type="partial fjssp")
+
+    rng = np.random.default_rng(0)
+    flexible = [op for op in instance.O if len(instance.M_i[op]) > 1]
+    moves = []
+    for op in rng.choice(flexible, size=min(3, len(flexible)), replace=False):
+        current = int(solution._assign_vect[op])
+        alternatives = [m for m in instance.M_i[op] if m != current]
+        moves.append((int(op), int(rng.choice(alternatives))))
+
+    patched = solution._graph.apply_moves(moves, tech_disjunc=False)
+
+    neighbor = solution.clone()
+    for op, machine in moves:
+        neighbor.assign(op, machine)
+    neighbor._sequence_by_assignment()
+    rebuilt = FJSSPGraph(
+        instance=instance,
+        machines_assignment=neighbor._get_machines_assignment(),
+        tech_disjunc=False,
+        graph_type="partial fjssp",
+    )
+
+    assert patched._machines_assignment == rebuilt._machines_assignment
+    for patched_timing, rebuilt_timing in zip(
+        patched.heads_and_tails(), rebuilt.heads_and_tails()
+    ):
+        np.testing.assert_allclose(patched_timing, rebuilt_timing)
+    # the parent graph is left untouched
+    assert solution._graph._op_machine.tolist() == solution._assign_vect.tolist()
@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip("mip")
+
+from src.fjssp_heurs.processing.model import MathModel  # noqa: E402
+
+from conftest import build_solution, load_instance  # noqa: E402
+
+
+@pytest.mark.parametrize("bulk_build", [False, True])
+def test_cbc_reaches_the_known_optimum(bulk_build, logger):
+    instance = load_instance("kacem/k1")
+    start = build_solution(instance, logger)
+
+    model = MathModel(
+        instance=instance,
+        logger=logger,
+        upper_bound=start._makespan,
+        bulk_build=bulk_build,
+    )
+    model.optimize(time_limit=60, start=start)
+
+    assert model._makespan == pytest.approx(instance.optimal_solution)
+    assert model._status.name == "OPTIMAL"
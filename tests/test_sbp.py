@@ -0,0 +1,111 @@
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from src.fjssp_heurs.processing.metaheuristic.sbp.carlier import CarlierSolver
+from src.fjssp_heurs.processing.metaheuristic.sbp.sbp import ShiftingBottleneck
+
+from conftest import INSTANCES, assert_feasible, build_solution, load_instance
+
+
+def _sequence_with_sbp(solution, sbp, logger):
+    sbp_solution = solution.clone()
+    sbp_solution._sequence_by_assignment()
+    sbp_solution.create_graph(tech_disjunc=False, graph_type="partial fjssp")
+    sbp.process(solution=sbp_solution, old_logger=logger)
+    sbp_solution._recalculate_times(logger=logger)
+    return sbp_solution
+
+
+def _lmax(sequence, release_dates, processing_times, delivery_times) -> float:
+    time = 0.0
+    lmax = 0.0
+    for op in sequence:
+        time = max(time, release_dates[op]) + processing_times[op]
+        lmax = max(lmax, time + delivery_times[op])
+    return lmax
+
+
+def _random_subproblem(instance, seed: int):
+    # one op per job, so the subproblem has no technological precedences
+    rng = np.random.default_rng(seed)
+    operations = [ops[0] for ops in list(instance.S_j.values())[:6]]
+    release_dates = {op: float(rng.integers(0, 20)) for op in operations}
+    processing_times = {op: float(rng.integers(1, 10)) for op in operations}
+    delivery_times = {op: float(rng.integers(0, 20)) for op in operations}
+    return operations, release_dates, processing_times, delivery_times
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_sbp_schedules_are_feasible(name, logger):
+    solution = build_solution(load_instance(name), logger)
+
+    sbp = ShiftingBottleneck(log_out="off")
+    try:
+        sbp_solution = _sequence_with_sbp(solution, sbp, logger)
+    finally:
+        sbp.close()
+
+    assert_feasible(sbp_solution)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_sbp_cache_hits_return_the_same_schedule(name, logger):
+    solution = build_solution(load_instance(name), logger)
+
+    uncached = ShiftingBottleneck(log_out="off", cache_size=0)
+    cached = ShiftingBottleneck(log_out="off")
+    try:
+        reference = _sequence_with_sbp(solution, uncached, logger)
+        first = _sequence_with_sbp(solution, cached, logger)
+        misses = cached.cache_info()["misses"]
+        second = _sequence_with_sbp(solution, cached, logger)
+    finally:
+        uncached.close()
+        cached.close()
+
+    assert uncached.cache_info()["hits"] == 0
+    assert cached.cache_info()["misses"] == misses
+    assert cached.cache_info()["hits"] > 0
+    for sbp_solution in (first, second):
+        assert sbp_solution.machine_sequences() == reference.machine_sequences()
+        assert sbp_solution._makespan == reference._makespan
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_carlier_best_first_is_optimal(seed, logger):
+    instance = load_instance("barnes/mt10c1")
+    subproblem = _random_subproblem(instance, seed)
+    optimum = min(
+        _lmax(sequence, *subproblem[1:]) for sequence in permutations(subproblem[0])
+    )
+
+    best_first, sequence = CarlierSolver(
+        *subproblem, instance=instance, logger=logger, mode="best_first"
+    ).solve()
+    depth_first, _ = CarlierSolver(
+        *subproblem, instance=instance, logger=logger, mode="depth_first"
+    ).solve()
+
+    assert sorted(sequence) == sorted(subproblem[0])
+    assert best_first == pytest.approx(optimum)
+    assert _lmax(sequence, *subproblem[1:]) == pytest.approx(optimum)
+    assert depth_first >= optimum - 1e-9
+
+
+@pytest.mark.parametrize(
+    "params", [{"mode": "breadth_first"}, {"max_nodes": 0}, {"max_nodes": -5}]
+)
+def test_carlier_rejects_invalid_search(params, logger):
+    instance = load_instance("kacem/k1")
+    subproblem = _random_subproblem(instance, 0)
+
+    with pytest.raises(ValueError):
+        CarlierSolver(*subproblem, instance=instance, logger=logger, **params)
+    with pytest.raises(ValueError):
+        ShiftingBottleneck(
+            log_out="off",
+            carlier_mode=params.get("mode", "depth_first"),
+            carlier_max_nodes=params.get("max_nodes"),
+        )
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from conftest import INSTANCES, assert_feasible, build_solution, load_instance
+
+
+@pytest.mark.parametrize("approach", ["grasp", "event_driven", "machine_by_machine"])
+@pytest.mark.parametrize("name", INSTANCES)
+def test_built_schedules_are_feasible(name, approach, logger):
+    solution = build_solution(load_instance(name), logger, approach=approach)
+
+    assert_feasible(solution)
+    assert solution._makespan >= solution._instance.optimal_solution
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_clones_do_not_write_through(name, logger):
+    instance = load_instance(name)
+    solution = build_solution(instance, logger)
+    assign_vect = solution._assign_vect.copy()
+    sequences = solution.machine_sequences()
+
+    clone = solution.clone()
+    op = next(op for op in instance.O if len(instance.M_i[op]) > 1)
+    other = next(m for m in instance.M_i[op] if m != solution._assign_vect[op])
+    clone.assign(op, other)
+    machine = next(m for m, sequence in enumerate(sequences) if len(sequence) > 1)
+    clone.set_machine_sequence(machine, sequences[machine][::-1])
+
+    np.testing.assert_array_equal(solution._assign_vect, assign_vect)
+    assert solution.machine_sequences() == sequences
+    assert clone._assign_vect[op] == other
+    assert clone.machine_sequence(machine) == sequences[machine][::-1]
+
+    # the original stays writable once its clone has diverged
+    solution.assign(op, int(assign_vect[op]))
+    assert clone._assign_vect[op] == other
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_critical_path_splits_into_machine_blocks(name, logger):
+    solution = build_solution(load_instance(name), logger)
+    instance = solution._instance
+    start_times = solution._start_times
+    finish_times = solution._finish_times
+
+    path, _, blocks = solution._find_a_critical_path()
+
+    assert start_times[path[0]] == 0
+    assert finish_times[path[-1]] == solution._makespan
+    for prev_op, op in zip(path[:-1], path[1:]):
+        assert start_times[op] == finish_times[prev_op]
+
+    assert [op for block in blocks for op in block] == path
+    for block in blocks:
+        machines = {int(solution._assign_vect[op]) for op in block}
+        assert len(machines) == 1
+        positions = [int(solution._seq_pos[op]) for op in block]
+        assert positions == list(range(positions[0], positions[0] + len(block)))
+    # consecutive blocks are linked by a job arc, not by a machine arc
+    for prev_block, block in zip(blocks[:-1], blocks[1:]):
+        assert instance.job_of_op[prev_block[-1]] == instance.job_of_op[block[0]]